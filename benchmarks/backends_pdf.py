@@ -0,0 +1,96 @@
+# ============================================================
+#  COMPARATIVA DE BACKENDS DE TEXTO PDF
+#  Uso:
+#    python benchmarks/backends_pdf.py [--herramienta upc|cc] [--repeticiones N] archivo.pdf ...
+#  Para cada PDF y cada backend mide el tiempo de extracción de texto y de
+#  parseo, y compara los registros con los del backend por defecto (pdfplumber).
+# ============================================================
+
+import sys
+import time
+import argparse
+import importlib.util
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+HERRAMIENTAS = {
+    "upc": RAIZ / "upc_sticker" / "analizador_upc.py",
+    "cc": RAIZ / "case_content" / "extractor.py",
+}
+
+
+def cargar_herramienta(nombre: str):
+    ruta = HERRAMIENTAS[nombre]
+    spec = importlib.util.spec_from_file_location(ruta.stem, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def medir(mod, pdf_path: str, backend: str, repeticiones: int) -> dict:
+    mejor_texto = mejor_parseo = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        textos = mod.leer_textos_pdf(pdf_path, backend)
+        t1 = time.perf_counter()
+        registros = mod.parse_data_from_textos(textos)
+        t2 = time.perf_counter()
+        mejor_texto = min(mejor_texto, t1 - t0)
+        mejor_parseo = min(mejor_parseo, t2 - t1)
+    return {
+        "paginas": len(textos),
+        "texto_s": mejor_texto,
+        "parseo_s": mejor_parseo,
+        "formato": mod.detectar_formato_texto(textos[0] if textos else ""),
+        "registros": registros,
+    }
+
+
+def primera_diferencia(a: list[dict], b: list[dict]) -> str:
+    for i, (ra, rb) in enumerate(zip(a, b)):
+        if ra != rb:
+            return f"fila {i}: {ra} != {rb}"
+    return f"{len(a)} vs {len(b)} registros"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Compara los backends de texto PDF (velocidad y resultado).")
+    ap.add_argument("pdfs", nargs="+")
+    ap.add_argument("--herramienta", choices=sorted(HERRAMIENTAS), default="upc")
+    ap.add_argument("--repeticiones", type=int, default=1)
+    args = ap.parse_args()
+
+    mod = cargar_herramienta(args.herramienta)
+    backends = list(mod.BACKENDS_PDF)
+    referencia = "pdfplumber"
+    distintos = 0
+
+    print(f"{'PDF':<32} {'backend':<11} {'formato':<10} {'págs':>5} {'texto s':>9} {'págs/s':>8} {'parseo s':>9} {'regs':>7}  igual")
+    for pdf in args.pdfs:
+        try:
+            resultados = {b: medir(mod, pdf, b, max(1, args.repeticiones)) for b in backends}
+        except Exception as e:
+            print(f"{Path(pdf).name[:32]:<32} no se pudo leer: {type(e).__name__}: {e}")
+            distintos += 1
+            continue
+        base = resultados[referencia]["registros"]
+        for b, r in resultados.items():
+            igual = r["registros"] == base
+            distintos += not igual
+            ritmo = r["paginas"] / r["texto_s"] if r["texto_s"] else 0.0
+            print(
+                f"{Path(pdf).name[:32]:<32} {b:<11} {r['formato']:<10} {r['paginas']:>5} "
+                f"{r['texto_s']:>9.3f} {ritmo:>8.1f} {r['parseo_s']:>9.3f} {len(r['registros']):>7}  "
+                f"{'sí' if igual else 'NO'}"
+            )
+            if not igual:
+                print(f"    {b} difiere de {referencia}: {primera_diferencia(base, r['registros'])}")
+        t_ref = resultados[referencia]["texto_s"]
+        for b, r in resultados.items():
+            if b != referencia and r["texto_s"]:
+                print(f"    {b}: x{t_ref / r['texto_s']:.1f} frente a {referencia}")
+    return 1 if distintos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# ============================================================
+#  MEMORIA AL LEER EL EXCEL DE DATOS: hoja completa / columnas útiles
+#  Uso:
+#    python benchmarks/memoria_excel.py [--herramienta upc|cc] [--filas N] [--columnas-extra N] [excel.xlsx]
+#  Sin archivo genera un Excel sintético (por defecto 20.000 filas) con las
+#  columnas que usa preparar_excel más N columnas que no usa (comentarios,
+#  fechas, totales...), como las hojas de pedido reales.
+#  Mide con tracemalloc el pico y la memoria del DataFrame leído cargando la
+#  hoja completa (APP_EXCEL_STREAMING=0) y en streaming sólo con las columnas
+#  útiles. preparar_excel debe dar el mismo resultado con ambos.
+# ============================================================
+
+import os
+import sys
+import time
+import random
+import argparse
+import datetime
+import tempfile
+import tracemalloc
+import contextlib
+import importlib.util
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+HERRAMIENTAS = {
+    "upc": (RAIZ / "upc_sticker" / "analizador_upc.py", "leer_excel_flexible", "TS"),
+    "cc": (RAIZ / "case_content" / "extractor.py", "_read_excel_flexible", "TP"),
+}
+TALLAS = ["XS", "S", "M", "L", "XL", "2XL"]
+
+
+def cargar_herramienta(ruta: Path):
+    spec = importlib.util.spec_from_file_location(ruta.stem, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def excel_sintetico(ruta: Path, n_filas: int, n_extra: int, prefijo: str, seed: int = 7) -> None:
+    rnd = random.Random(seed)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("PEDIDO")
+    ws.append(["REPORTE DE PEDIDOS"])
+    ws.append([])
+    ws.append(["STYLE", "OP", "PROTO", "DESTINO", "PO#", "DESCRIPCION COLOR", "COLOR", "LN"] + TALLAS
+              + [f"OBS {k}" for k in range(n_extra)])
+    for i in range(n_filas):
+        fila = [f"{prefijo}{100 + i // 12}", 50000 + i // 40, f"P{i // 40}", rnd.choice(["USA", "USA", "CANADA"]),
+                4500000000 + i // 6, rnd.choice(["BLACK", "NAVY BLUE", "WHITE/GREY"]), rnd.choice(["001", "410", "100"]), i % 9]
+        fila += [rnd.choice([None, 0, 12, 24, 36]) for _ in TALLAS]
+        fila += [rnd.choice([None, f"nota {i}", i * 1.5, datetime.datetime(2024, 1, 1 + i % 28)]) for _ in range(n_extra)]
+        ws.append(fila)
+    wb.save(ruta)
+
+
+def medir(leer, ruta: str) -> tuple[pd.DataFrame, float, int, int]:
+    """(DataFrame, segundos, bytes del DataFrame retenido, pico de la lectura)."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(None):
+        df = leer(ruta)
+    segundos = time.perf_counter() - t0
+    ocupados, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, segundos, ocupados, pico
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Pico de memoria al leer el Excel de datos: hoja completa frente a columnas útiles.")
+    ap.add_argument("excel", nargs="?")
+    ap.add_argument("--herramienta", choices=sorted(HERRAMIENTAS), default="upc")
+    ap.add_argument("--filas", type=int, default=20_000)
+    ap.add_argument("--columnas-extra", type=int, default=40)
+    args = ap.parse_args()
+
+    ruta_mod, nombre_leer, prefijo = HERRAMIENTAS[args.herramienta]
+    mod = cargar_herramienta(ruta_mod)
+    leer = getattr(mod, nombre_leer)
+    mb = 1024 * 1024
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = args.excel
+        if not ruta:
+            ruta = str(Path(tmp) / "datos.xlsx")
+            excel_sintetico(Path(ruta), args.filas, args.columnas_extra, prefijo)
+        print(f"{args.herramienta}: {Path(ruta).name} ({os.path.getsize(ruta) / mb:.1f} MB)")
+
+        resultados = {}
+        for modo, streaming in (("hoja completa", False), ("columnas útiles", True)):
+            mod.EXCEL_STREAMING = streaming
+            df, segundos, ocupados, pico = medir(leer, ruta)
+            with contextlib.redirect_stdout(None):
+                resultados[modo] = mod.preparar_excel(df)
+            print(f"  {modo:<16}: {df.shape[0]:>8,} x {df.shape[1]:<3} DataFrame {ocupados / mb:7.1f} MB  "
+                  f"pico {pico / mb:7.1f} MB  {segundos:6.2f} s")
+            del df
+
+    completo, util = resultados.values()
+    iguales = completo.equals(util)
+    print(f"  mismo preparar_excel: {'sí' if iguales else 'NO'}")
+    return 0 if iguales else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# ============================================================
+#  MEMORIA DE REGISTROS PDF: dicts por fila / buffers por columna
+#  Uso:
+#    python benchmarks/memoria_registros.py [--herramienta upc|cc] [--upcs N]
+#  Genera N UPCs sintéticos (por defecto 1.000.000) en los dos formatos:
+#   - Matricial: eventos del tokenizador (estilo + tallas, color + UPCs).
+#   - Barras: páginas de texto "Division|Style|UPC|...".
+#  Para cada uno mide, con tracemalloc, la memoria que ocupan los registros
+#  y el pico hasta tener el DataFrame, con el ensamblado anterior (un dict
+#  por UPC + pd.DataFrame(lista)) y con RegistrosPDF + to_dataframe().
+#  Ambos deben dar el mismo DataFrame.
+# ============================================================
+
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+import importlib.util
+from pathlib import Path
+
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+HERRAMIENTAS = {
+    "upc": (RAIZ / "upc_sticker" / "analizador_upc.py", "TS"),
+    "cc": (RAIZ / "case_content" / "extractor.py", "TP"),
+}
+TALLAS = ["XS", "S", "M", "L", "XL", "2XL", "3XL"]
+COLORES = [("001", "BLACK"), ("410", "NAVY BLUE"), ("100", "WHITE/GREY"), ("6A1", "HEATHER RED"), ("F2B", "OFF-WHITE")]
+
+
+def cargar_herramienta(ruta: Path):
+    spec = importlib.util.spec_from_file_location(ruta.stem, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+# Ensamblado anterior, tal cual (un dict por UPC)
+def ensamblar_anterior(eventos_por_pagina) -> list[dict]:
+    registros: list[dict] = []
+    style_actual = None
+    tallas_actuales: list[str] = []
+    for eventos in eventos_por_pagina:
+        for ev in eventos:
+            if ev[0] == "S":
+                _, style_actual, tallas_actuales = ev
+                continue
+            _, color_code, color_name, upcs = ev
+            if not (style_actual and tallas_actuales):
+                continue
+            for idx in range(min(len(tallas_actuales), len(upcs))):
+                registros.append({
+                    "STYLE": style_actual,
+                    "COLOR CODE": color_code,
+                    "COLOR NAME": color_name,
+                    "SIZE": tallas_actuales[idx].upper(),
+                    "UPC CODE": upcs[idx],
+                    "STYLE COLOR": f"{style_actual} {color_code}",
+                })
+    return registros
+
+
+def eventos_sinteticos(n_upcs: int, prefijo: str, seed: int = 7) -> list[list[tuple]]:
+    """Eventos Matricial como los produce tokenizar_pagina_matricial (~60 por página)."""
+    rnd = random.Random(seed)
+    paginas: list[list[tuple]] = [[]]
+    upc, estilo, total = 190000000000, 100, 0
+    while total < n_upcs:
+        n_t = rnd.randint(3, len(TALLAS))
+        paginas[-1].append(("S", f"{prefijo}{estilo}", [t.lower() for t in TALLAS[:n_t]]))
+        estilo += 1
+        for code, name in rnd.sample(COLORES, rnd.randint(2, len(COLORES))):
+            paginas[-1].append(("C", code, name, [str(upc + k) for k in range(n_t)]))
+            upc += n_t
+            total += n_t
+        if len(paginas[-1]) > 60:
+            paginas.append([])
+    return paginas
+
+
+def paginas_barras(n_upcs: int, seed: int = 7) -> list[str]:
+    rnd = random.Random(seed)
+    paginas: list[str] = []
+    lineas = ["Division|Style|UPC|Style Name|Color Code|Color Name|Size Group|Size"]
+    estilo = 100
+    for upc in range(190000000000, 190000000000 + n_upcs):
+        if upc % 7 == 0:
+            estilo += 1
+        code, name = COLORES[estilo % len(COLORES)]
+        lineas.append(f"31|ST{estilo}|{upc}|BASIC TEE|{code}|{name}|ALPHA|{rnd.choice(TALLAS)}")
+        if len(lineas) > 60:
+            paginas.append("\n".join(lineas))
+            lineas = ["Division|Style|UPC|Style Name|Color Code|Color Name|Size Group|Size"]
+    if len(lineas) > 1:
+        paginas.append("\n".join(lineas))
+    return paginas
+
+
+def medir(armar, a_dataframe) -> tuple[pd.DataFrame, float, int, int]:
+    """(DataFrame, segundos, bytes de los registros, pico hasta el DataFrame)."""
+    t0 = time.perf_counter()
+    df = a_dataframe(armar())
+    segundos = time.perf_counter() - t0
+    del df
+
+    tracemalloc.start()
+    registros = armar()
+    ocupados = tracemalloc.get_traced_memory()[0]
+    df = a_dataframe(registros)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return df, segundos, ocupados, pico
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Pico de memoria de los registros PDF: dicts frente a columnas.")
+    ap.add_argument("--herramienta", choices=sorted(HERRAMIENTAS), default="upc")
+    ap.add_argument("--upcs", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    ruta, prefijo = HERRAMIENTAS[args.herramienta]
+    mod = cargar_herramienta(ruta)
+    mb = 1024 * 1024
+    distintos = 0
+
+    eventos = eventos_sinteticos(args.upcs, prefijo)
+    textos = paginas_barras(args.upcs)
+    casos = {
+        "Matricial": (
+            (lambda: ensamblar_anterior(eventos), pd.DataFrame),
+            (lambda: mod.ensamblar_matricial(eventos), lambda r: r.to_dataframe()),
+        ),
+        "Barras": (
+            (lambda: list(mod.iter_data_barras(textos)), pd.DataFrame),
+            (lambda: mod.parse_data_barras(textos), lambda r: r.to_dataframe()),
+        ),
+    }
+    for formato, (anterior, actual) in casos.items():
+        df_ant, t_ant, occ_ant, pico_ant = medir(*anterior)
+        df_act, t_act, occ_act, pico_act = medir(*actual)
+        iguales = df_ant.equals(df_act)
+        distintos += not iguales
+
+        print(f"{args.herramienta} / {formato}: {len(df_act):,} UPCs")
+        print(f"  dicts    : registros {occ_ant / mb:8.1f} MB  pico {pico_ant / mb:8.1f} MB  {t_ant:7.2f} s")
+        print(f"  columnas : registros {occ_act / mb:8.1f} MB  pico {pico_act / mb:8.1f} MB  {t_act:7.2f} s  "
+              f"(pico x{pico_ant / pico_act:.2f} menor)")
+        print(f"  mismo DataFrame: {'sí' if iguales else 'NO'}")
+        del df_ant, df_act
+    return 1 if distintos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
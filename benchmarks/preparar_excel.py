@@ -0,0 +1,412 @@
+# ============================================================
+#  PREPARAR_EXCEL: callbacks por celda / operaciones vectorizadas
+#  Uso:
+#    python benchmarks/preparar_excel.py [--herramienta upc|cc] [--filas N] [--repeticiones N]
+#  Genera la tabla que devuelve la lectura del Excel de datos (por defecto
+#  50.000 filas x 8 tallas, cada fila con 3-4 tallas llenas, CASE QTY / WIP /
+#  TT combinadas) y mide tiempo y pico de memoria (tracemalloc) de
+#  preparar_excel tal como estaba (melt completo + apply(has_qty), map(lambda)
+#  de tallas, transform(lambda s: s.ffill())) y del actual (vectorizado,
+#  despivotando sólo las tallas con cantidad).
+#  Ambos deben devolver exactamente el mismo DataFrame.
+# ============================================================
+
+import io
+import sys
+import time
+import random
+import argparse
+import contextlib
+import tracemalloc
+import importlib.util
+from pathlib import Path
+
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+HERRAMIENTAS = {
+    "upc": (RAIZ / "upc_sticker" / "analizador_upc.py", "TS"),
+    "cc": (RAIZ / "case_content" / "extractor.py", "TP"),
+}
+TALLAS = ["XXS", "XS", "S", "M", "L", "XL", "2XL", "3XL"]
+
+
+def cargar_herramienta(ruta: Path):
+    spec = importlib.util.spec_from_file_location(ruta.stem, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+# Preparación anterior, tal cual (referencia de resultado y de velocidad)
+
+def preparar_anterior_upc(mod, df_excel: pd.DataFrame) -> pd.DataFrame:
+    """Renombra columnas a nombres internos y (si hay tallas como columnas)
+    deja un registro por talla (columna SIZE).
+    """
+    cols_norm = {mod.norm_col(c): c for c in df_excel.columns}
+
+    def pick_col(*candidates: str) -> str | None:
+        for cand in candidates:
+            if cand in cols_norm:
+                return cols_norm[cand]
+        return None
+
+    rename_map: dict[str, str] = {}
+
+    style_col = pick_col('ESTILOS', 'STYLE')
+    if style_col:
+        rename_map[style_col] = 'NOMBRE ESTILO'
+
+    # OP o RSV (fix principal)
+    op_col = pick_col('OP')
+    rsv_col = pick_col('RSV')
+    if op_col:
+        rename_map[op_col] = 'PEDIDO PRODUCCION COFACO'
+    elif rsv_col:
+        rename_map[rsv_col] = 'PEDIDO PRODUCCION COFACO'
+
+    proto_col = pick_col('PROTO')
+    if proto_col:
+        rename_map[proto_col] = 'PROTO COFACO'
+
+    destino_col = pick_col('DESTINO')
+    if destino_col:
+        rename_map[destino_col] = 'DESTINO'
+
+    po_col = pick_col('PO', 'PO NO', 'PO NO.', 'PO#')
+    if po_col:
+        rename_map[po_col] = 'PO#'
+
+    # (Opcional) LN si existe
+    ln_col = pick_col('LN')
+    if ln_col:
+        rename_map[ln_col] = 'LN'
+
+    # Nombre de color (fix: incluye "DESCRIPCION DE COLOR")
+    nombre_color_col = pick_col('DESCRIPCION COLOR', 'DESCRIPCION DE COLOR')
+    if not nombre_color_col:
+        nombre_color_col = pick_col('COLOR', 'CARTA')
+    if nombre_color_col:
+        rename_map[nombre_color_col] = 'NOMBRE COLOR'
+
+    # Código de color
+    codigo_color_col = pick_col('COLR CODE', 'COLOR CODE')
+    if not codigo_color_col:
+        codigo_color_col = pick_col('CODE')
+    if not codigo_color_col:
+        color_col = cols_norm.get('COLOR')
+        if color_col and color_col != nombre_color_col:
+            codigo_color_col = color_col
+    if codigo_color_col:
+        rename_map[codigo_color_col] = 'COLOR'
+
+    df_excel = df_excel.rename(columns=rename_map)
+
+    # Requeridas (OP ya no es obligatorio si hay RSV)
+    requeridas = ['NOMBRE ESTILO', 'PEDIDO PRODUCCION COFACO', 'PROTO COFACO', 'DESTINO', 'PO#', 'NOMBRE COLOR']
+    falt = [c for c in requeridas if c not in df_excel.columns]
+    if falt:
+        raise ValueError(f"Faltan columnas en el Excel: {falt}")
+
+    if 'COLOR' not in df_excel.columns:
+        df_excel['COLOR'] = ""
+
+    # Normaliza texto
+    for c in ['NOMBRE ESTILO', 'DESTINO', 'NOMBRE COLOR', 'COLOR']:
+        df_excel[c] = df_excel[c].astype(str).str.strip().str.upper()
+
+    # Detecta tallas como columnas (S, M, L, XL, 2XL, 3XL, etc.)
+    size_cols = []
+    for c in df_excel.columns:
+        cu = str(c).strip().upper()
+        if cu in mod.SIZE_CANONICAL or cu in mod.SIZE_MAP:
+            size_cols.append(c)
+
+    if size_cols:
+        canon = {c: mod.SIZE_MAP.get(str(c).strip().upper(), str(c).strip().upper()) for c in size_cols}
+
+        id_vars = ['NOMBRE ESTILO', 'PEDIDO PRODUCCION COFACO', 'PROTO COFACO', 'DESTINO', 'PO#', 'NOMBRE COLOR', 'COLOR']
+        if 'LN' in df_excel.columns:
+            id_vars.append('LN')
+
+        df_long = df_excel.melt(
+            id_vars=id_vars,
+            value_vars=size_cols,
+            var_name='SIZE_RAW',
+            value_name='QTY'
+        )
+        df_long['SIZE'] = df_long['SIZE_RAW'].map(lambda x: canon.get(x, str(x).upper()))
+
+        def has_qty(v) -> bool:
+            if v is None:
+                return False
+            s = str(v).strip()
+            if s in ("", "0", "0.0"):
+                return False
+            try:
+                return float(s) > 0
+            except Exception:
+                return True
+
+        df_long = df_long[df_long['QTY'].apply(has_qty)].copy()
+        df_long['SIZE'] = df_long['SIZE'].map(mod.norm_size)
+
+        df_long['SIZE_SORTED'] = pd.Categorical(df_long['SIZE'], categories=mod.SIZE_ORDER, ordered=True)
+        sort_cols = ['NOMBRE ESTILO', 'DESTINO', 'NOMBRE COLOR', 'SIZE_SORTED']
+        df_long = df_long.sort_values(sort_cols).drop(columns=['SIZE_SORTED'])
+
+        keep = id_vars + ['SIZE']
+        return df_long[keep].reset_index(drop=True)
+
+    # Si no hay columnas de tallas, devuelve estructura única (sin SIZE)
+    base_cols = ['NOMBRE ESTILO', 'PEDIDO PRODUCCION COFACO', 'PROTO COFACO', 'DESTINO', 'PO#', 'NOMBRE COLOR', 'COLOR']
+    if 'LN' in df_excel.columns:
+        base_cols.append('LN')
+
+    return df_excel[base_cols].drop_duplicates().reset_index(drop=True)
+
+
+def preparar_anterior_cc(mod, df_excel: pd.DataFrame) -> pd.DataFrame:
+    df_excel = mod._rename_canonical(df_excel)
+
+    # Forward-fill para columnas que suelen tener celdas combinadas (merged) en el Excel.
+    # Pandas solo lee el valor de la primera celda del rango combinado; las demás quedan NaN.
+    # Se hace ffill agrupado por NOMBRE ESTILO (o su alias) para no arrastrar valores entre estilos distintos.
+    _ffill_cols = ["CASE QTY", "WIP LINE NUMBER", "TT"]
+    _group_col = None
+    for _gc in ["NOMBRE ESTILO", "STYLE", "ESTILOS"]:
+        if _gc in df_excel.columns:
+            _group_col = _gc
+            break
+    for _fc in _ffill_cols:
+        if _fc in df_excel.columns:
+            if _group_col:
+                df_excel[_fc] = df_excel.groupby(_group_col)[_fc].transform(lambda s: s.ffill())
+            else:
+                df_excel[_fc] = df_excel[_fc].ffill()
+
+    # Resolver columnas duplicadas (p.ej. múltiples "COLOR CODE")
+    if "COLOR CODE" in df_excel.columns and isinstance(df_excel["COLOR CODE"], pd.DataFrame):
+        combined = df_excel["COLOR CODE"].bfill(axis=1).iloc[:, 0]
+        df_excel = df_excel.drop(columns=["COLOR CODE"])
+        df_excel["COLOR CODE"] = combined
+
+    # Ajustes para nuevos formatos (p.ej. COLOR = nombre y COLR CODE = código)
+    if "NOMBRE COLOR" not in df_excel.columns:
+        if "COLOR" in df_excel.columns:
+            df_excel["NOMBRE COLOR"] = df_excel["COLOR"].astype(str)
+        elif "CARTA" in df_excel.columns:
+            df_excel["NOMBRE COLOR"] = df_excel["CARTA"].astype(str)
+
+    if "COLOR" not in df_excel.columns and "COLOR CODE" in df_excel.columns:
+        df_excel["COLOR"] = df_excel["COLOR CODE"].astype(str)
+
+    if "COLOR" in df_excel.columns and "COLOR CODE" in df_excel.columns:
+        # Si COLOR es nombre y COLOR CODE es código, priorizar el código en COLOR
+        df_excel["COLOR"] = df_excel["COLOR CODE"].astype(str)
+
+    # Soporte: si la plantilla trae la columna "COLUMNA1" (renombrada a "HOJA MARCACION")
+    # pero en realidad contiene el WIP Line Number, detectar y copiarla a la columna esperada.
+    try:
+        if "WIP LINE NUMBER" not in df_excel.columns and "HOJA MARCACION" in df_excel.columns:
+            sample = df_excel["HOJA MARCACION"].dropna().astype(str).head(20).tolist()
+            if sample:
+                import re
+                digits_ratio = sum(1 for s in sample if re.search(r"\d", s)) / len(sample)
+                # Si una proporción razonable contiene dígitos, asumimos que es WIP
+                if digits_ratio >= 0.4:
+                    df_excel["WIP LINE NUMBER"] = df_excel["HOJA MARCACION"].astype(str)
+                    print('DEBUG: Copiada columna HOJA MARCACION -> WIP LINE NUMBER (detección automática)')
+    except Exception:
+        pass
+
+    # Normalizar alias comunes de UPC en caso de que Excel tenga otro encabezado
+    try:
+        if "UPC Barcode" not in df_excel.columns:
+            for alt in ["UPC CODE", "UPC", "UPC_BARCODE", "UPC BARCODE"]:
+                if alt in df_excel.columns:
+                    df_excel["UPC Barcode"] = df_excel[alt].astype(str)
+                    print(f'DEBUG: Copiada columna {alt} -> UPC Barcode')
+                    break
+    except Exception:
+        pass
+
+    # Debug: mostrar columnas encontradas
+    print(f"Columnas encontradas en Excel: {list(df_excel.columns)}")
+
+    # Si no hay columnas reconocidas, mostrar las primeras filas para diagnóstico
+    if all("Unnamed" in str(col) or "Col_" in str(col) for col in df_excel.columns):
+        print("El Excel parece no tener encabezados claros. Primeras 3 filas:")
+        print(df_excel.head(3).to_string())
+        raise ValueError(
+            "No se pudieron identificar las columnas necesarias en el Excel.\n\n"
+            "El archivo debe tener columnas con nombres como:\n"
+            "- NOMBRE ESTILO (o ESTILOS)\n"
+            "- DESTINO\n"
+            "- PO# (o PO)\n"
+            "- NOMBRE COLOR (o DESCRIPCION COLOR)\n"
+            "- COLOR\n\n"
+            "Verifica que:\n"
+            "1. El archivo tenga encabezados en la primera fila\n"
+            "2. Los nombres de las columnas estén escritos correctamente\n"
+            "3. No haya filas vacías antes de los encabezados"
+        )
+
+    requeridas = [
+        "NOMBRE ESTILO",
+        "DESTINO",
+        "PO#",
+        "NOMBRE COLOR",
+        "COLOR",
+    ]
+    falt = [c for c in requeridas if c not in df_excel.columns]
+    if falt:
+        # Mostrar más información para diagnosticar
+        available_cols = list(df_excel.columns)
+        raise ValueError(f"Faltan columnas requeridas en el Excel: {falt}\n\nColumnas disponibles: {available_cols}\n\nVerifica que el archivo Excel tenga las columnas necesarias o que estén bien escritas.")
+
+    # Add missing optional columns with default values
+    if "PEDIDO PRODUCCION COFACO" not in df_excel.columns:
+        df_excel["PEDIDO PRODUCCION COFACO"] = ""
+    if "PROTO COFACO" not in df_excel.columns:
+        df_excel["PROTO COFACO"] = ""
+
+    for c in ["NOMBRE ESTILO", "DESTINO", "NOMBRE COLOR", "COLOR"]:
+        df_excel[c] = df_excel[c].astype(str).str.strip().str.upper()
+
+    # ¿Tallas como columnas?
+    size_cols: list[str] = []
+    for c in df_excel.columns:
+        cu = str(c).strip().upper()
+        if cu in mod.SIZE_CANONICAL or cu in mod.SIZE_MAP:
+            size_cols.append(c)
+
+    id_vars_base = [
+        "NOMBRE ESTILO",
+        "PEDIDO PRODUCCION COFACO",
+        "PROTO COFACO",
+        "DESTINO",
+        "PO#",
+        "NOMBRE COLOR",
+        "COLOR",
+    ]
+    extras: list[str] = []
+    for c in ["HOJA MARCACION", "UNITS/TALLA (PEDIDO)", "WIP LINE NUMBER", "CASE QTY", "TT"]:
+        if c in df_excel.columns:
+            extras.append(c)
+
+    if size_cols:
+        canon = {c: mod.SIZE_MAP.get(str(c).strip().upper(), str(c).strip().upper()) for c in size_cols}
+        df_long = df_excel.melt(
+            id_vars=id_vars_base + extras,
+            value_vars=size_cols,
+            var_name="SIZE_RAW",
+            value_name="QTY",
+        )
+        df_long["SIZE"] = df_long["SIZE_RAW"].map(lambda x: canon.get(x, str(x).upper()))
+
+        def has_qty(v: object) -> bool:
+            if v is None:
+                return False
+            s = str(v).strip()
+            if s == "":
+                return False
+            try:
+                return float(s) > 0
+            except Exception:
+                return True
+
+        df_long = df_long[df_long["QTY"].apply(has_qty)].copy()
+        df_long.rename(columns={"QTY": "QTY POR TALLA"}, inplace=True)
+        return df_long.reset_index(drop=True)
+
+    out = df_excel[id_vars_base + extras].drop_duplicates().reset_index(drop=True)
+    out["SIZE"] = ""
+    out["QTY POR TALLA"] = ""
+    return out
+
+
+def tabla_sintetica(n_filas: int, prefijo: str, con_ln: bool, seed: int = 7) -> pd.DataFrame:
+    """Como la devuelve la lectura del Excel (dtype=str): textos y NaN en las celdas vacías.
+    En CC, LN es alias de WIP LINE NUMBER: sólo se incluye una de las dos.
+    """
+    rnd = random.Random(seed)
+    nan = float("nan")
+    filas = []
+    for i in range(n_filas):
+        inicio_estilo = i % 12 == 0
+        fila = {
+            "STYLE": f"{prefijo}{100 + i // 12}",
+            "OP": str(50000 + i // 40),
+            "PROTO": f"P{i // 40}",
+            "DESTINO": rnd.choice(["USA", "USA", "CANADA", " usa "]),
+            "PO#": str(4500000000 + i // 6),
+            "DESCRIPCION COLOR": rnd.choice(["BLACK", "NAVY BLUE", "WHITE/GREY", "heather red"]),
+            "COLOR": rnd.choice(["001", "410", "100", "6A1"]),
+            "CASE QTY": f"Q{rnd.choice([12, 24, 36])}" if inicio_estilo else nan,
+            "WIP LINE NUMBER": str(1000 + i // 12) if inicio_estilo else nan,
+            "TT": rnd.choice(["A", "B"]) if inicio_estilo else nan,
+        }
+        if con_ln:
+            fila["LN"] = str(i % 9) if rnd.random() < 0.8 else nan
+        desde = rnd.randint(0, len(TALLAS) - 4)
+        llenas = TALLAS[desde:desde + rnd.randint(3, 4)]
+        for t in TALLAS:
+            fila[t] = rnd.choice(["12", "24", "36", "6", "0", "1.5", "N/D"]) if t in llenas else nan
+        filas.append(fila)
+    return pd.DataFrame(filas).astype("str")
+
+
+def medir(fn, df: pd.DataFrame, repeticiones: int) -> tuple[float, int, pd.DataFrame]:
+    """(mejor tiempo, pico de memoria sobre la tabla de entrada, resultado)."""
+    mejor = float("inf")
+    resultado = pd.DataFrame()
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultado = fn(df.copy())
+        mejor = min(mejor, time.perf_counter() - t0)
+
+    entrada = df.copy()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(entrada)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return mejor, pico, resultado
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Tiempo de preparar_excel, antes y después de vectorizarlo.")
+    ap.add_argument("--herramienta", choices=sorted(HERRAMIENTAS), default="upc")
+    ap.add_argument("--filas", type=int, default=50_000)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    args = ap.parse_args()
+
+    ruta, prefijo = HERRAMIENTAS[args.herramienta]
+    mod = cargar_herramienta(ruta)
+    anterior = preparar_anterior_upc if args.herramienta == "upc" else preparar_anterior_cc
+    rep = max(1, args.repeticiones)
+
+    df = tabla_sintetica(args.filas, prefijo, con_ln=args.herramienta == "upc")
+    t_ant, pico_ant, res_ant = medir(lambda d: anterior(mod, d), df, rep)
+    t_act, pico_act, res_act = medir(mod.preparar_excel, df, rep)
+    try:
+        pd.testing.assert_frame_equal(res_ant, res_act)
+        iguales = True
+    except AssertionError as e:
+        print(e)
+        iguales = False
+
+    print(f"{args.herramienta}: {len(df):,} filas x {len(TALLAS)} tallas -> {len(res_act):,} filas preparadas")
+    mb = 1024 * 1024
+    print(f"  anterior    : {t_ant:8.3f} s  pico {pico_ant / mb:7.1f} MB")
+    print(f"  vectorizado : {t_act:8.3f} s  pico {pico_act / mb:7.1f} MB  (x{t_ant / t_act:.2f} más rápido, "
+          f"pico x{pico_ant / pico_act:.2f} menor)")
+    print(f"  mismo DataFrame: {'sí' if iguales else 'NO'}")
+    return 0 if iguales else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
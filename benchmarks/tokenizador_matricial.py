@@ -0,0 +1,179 @@
+# ============================================================
+#  MICRO-BENCHMARK: TOKENIZADOR MATRICIAL (antes / después)
+#  Uso:
+#    python benchmarks/tokenizador_matricial.py [--herramienta upc|cc] [--lineas N] [--repeticiones N]
+#  Genera reportes Matricial sintéticos (cabeceras, separadores, estilos con
+#  tallas en varias líneas, colores con UPCs partidos) y mide líneas/segundo
+#  del tokenizador anterior (regex con lookahead) y del actual (una pasada):
+#   - "limpio": sólo líneas cortas y bien formadas.
+#   - "real": además cabeceras largas de página, nombres de color largos y
+#     algún código de pack al final de la línea de color (las líneas que
+#     hacen retroceder a la regex de color).
+#  Ambos deben producir exactamente los mismos eventos.
+# ============================================================
+
+import re
+import sys
+import time
+import random
+import argparse
+import importlib.util
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+HERRAMIENTAS = {
+    "upc": (RAIZ / "upc_sticker" / "analizador_upc.py", "TS"),
+    "cc": (RAIZ / "case_content" / "extractor.py", "TP"),
+}
+
+# Parser anterior, tal cual (referencia de resultado y de velocidad)
+NUMBERS_ONLY = re.compile(r"^(?:\d{11,14}\s+)*\d{11,14}$")
+
+
+def tokenizar_anterior(text: str, style_re, size_token, color_line, salta_asteriscos: bool) -> list[tuple]:
+    numbers_only = NUMBERS_ONLY
+    eventos: list[tuple] = []
+    raw_lines = [ln.rstrip() for ln in text.split("\n")]
+    i = 0
+    while i < len(raw_lines):
+        line = raw_lines[i].strip()
+        if not line or line.startswith("-") or (salta_asteriscos and line.startswith("*")):
+            i += 1
+            continue
+
+        m_style = style_re.match(line)
+        if m_style:
+            tallas = size_token.findall(line)
+            j = i + 1
+            while j < len(raw_lines):
+                nxt = raw_lines[j].strip()
+                if not nxt:
+                    break
+                if style_re.match(nxt) or color_line.match(nxt):
+                    break
+                extra_sizes = size_token.findall(nxt)
+                if not extra_sizes:
+                    break
+                tallas.extend(extra_sizes)
+                j += 1
+            eventos.append(("S", m_style.group(1).upper(), tallas))
+            i = j
+            continue
+
+        m_color = color_line.match(line)
+        if m_color:
+            upcs: list[str] = []
+            if m_color.group(3):
+                upcs.extend(m_color.group(3).split())
+            k = i + 1
+            while k < len(raw_lines):
+                nxt = raw_lines[k].strip()
+                if numbers_only.match(nxt):
+                    upcs.extend(nxt.split())
+                    k += 1
+                    continue
+                break
+            eventos.append(("C", m_color.group(1).upper(), m_color.group(2).strip().upper(), upcs))
+            i = k
+            continue
+
+        i += 1
+
+    return eventos
+
+
+def cargar_herramienta(ruta: Path):
+    spec = importlib.util.spec_from_file_location(ruta.stem, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def reporte_sintetico(n_lineas: int, prefijo: str, real: bool = False, seed: int = 7) -> list[str]:
+    """Páginas de texto como las devuelve extract_text(), hasta ~n_lineas."""
+    rnd = random.Random(seed)
+    tallas = ["XS", "S", "M", "L", "XL", "2XL", "3XL"]
+    colores = ["001 BLACK", "410 NAVY BLUE", "100 WHITE/GREY", "6A1 HEATHER  RED", "F2B OFF-WHITE", "0C2 ST. MARINE"]
+    if real:
+        colores += ["0D4 BRIGHT WHITE/HEATHER GREY MULTI STRIPE", "7F1 DK. CHARCOAL HEATHER - WASHED BLACK"]
+    paginas: list[str] = []
+    pagina: list[str] = []
+    upc = 190000000000
+    total = 0
+    estilo = 100
+    while total < n_lineas:
+        if not pagina:
+            pagina = [f"UPC REPORT BY STYLE/COLOR            PAGE {len(paginas) + 1}", "-" * 70]
+            if real:
+                pagina[1:1] = [
+                    f"RUN DATE 03/18/2024 14:22:{len(paginas) % 60:02d} PLANT 1200 WAREHOUSE 05 SEASON FALL 2024 DIVISION 31",
+                    f"CUSTOMER 004512 ORDER 7730{len(paginas):06d} PAGE {len(paginas) + 1} OF ALL PAGES",
+                ]
+        n_t = rnd.randint(3, len(tallas))
+        cab = " ".join(f"** {t} **" for t in tallas[:n_t])
+        pagina.append(f"{prefijo}{estilo}{rnd.choice(['', 'A'])} {cab[:30]}")
+        if len(cab) > 30:
+            pagina.append(cab[30:].strip())
+        estilo += 1
+        for color in rnd.sample(colores, rnd.randint(2, len(colores))):
+            upcs = [str(upc + k) for k in range(n_t)]
+            upc += n_t
+            pack = f" {rnd.randint(10**14, 10**15 - 1)}" if real and rnd.random() < 0.1 else ""
+            pagina.append(f"{color} {' '.join(upcs[:3])}{pack}")
+            for k in range(3, n_t, 3):
+                pagina.append(" ".join(upcs[k:k + 3]))
+        pagina.append("-" * 60)
+        if len(pagina) > 55:
+            pagina.append("*** CONFIDENTIAL ***")
+            total += len(pagina)
+            paginas.append("\n".join(pagina))
+            pagina = []
+    if pagina:
+        total += len(pagina)
+        paginas.append("\n".join(pagina))
+    return paginas
+
+
+def medir(fn, paginas: list[str], repeticiones: int) -> tuple[float, list]:
+    mejor = float("inf")
+    eventos: list = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        eventos = [fn(p) for p in paginas]
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, eventos
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Líneas/segundo del tokenizador Matricial, antes y después.")
+    ap.add_argument("--herramienta", choices=sorted(HERRAMIENTAS), default="upc")
+    ap.add_argument("--lineas", type=int, default=150_000)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    args = ap.parse_args()
+
+    ruta, prefijo = HERRAMIENTAS[args.herramienta]
+    mod = cargar_herramienta(ruta)
+    salta = args.herramienta == "cc"
+
+    def anterior(text: str) -> list[tuple]:
+        return tokenizar_anterior(text, mod.MATRICIAL_STYLE_RE, mod.MATRICIAL_SIZE_TOKEN, mod.MATRICIAL_COLOR_LINE, salta)
+
+    rep = max(1, args.repeticiones)
+    distintos = 0
+    for nombre, real in (("limpio", False), ("real", True)):
+        paginas = reporte_sintetico(args.lineas, prefijo, real=real)
+        n_lineas = sum(p.count("\n") + 1 for p in paginas)
+        t_ant, ev_ant = medir(anterior, paginas, rep)
+        t_act, ev_act = medir(mod.tokenizar_pagina_matricial, paginas, rep)
+        iguales = ev_ant == ev_act
+        distintos += not iguales
+
+        print(f"{args.herramienta} / {nombre}: {n_lineas} líneas en {len(paginas)} páginas, {sum(map(len, ev_act))} eventos")
+        print(f"  anterior  : {t_ant:8.3f} s  {n_lineas / t_ant:>12,.0f} líneas/s")
+        print(f"  una pasada: {t_act:8.3f} s  {n_lineas / t_act:>12,.0f} líneas/s  (x{t_ant / t_act:.2f})")
+        print(f"  mismos eventos: {'sí' if iguales else 'NO'}")
+    return 1 if distintos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
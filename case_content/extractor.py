@@ -1,23 +1,46 @@
 import os
 import re
+import abc
+import difflib
 import sys
+import json
 import time
+import zlib
 import shutil
+import sqlite3
+import hashlib
 import platform
 import subprocess
 import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
 from dataclasses import dataclass
+from io import BytesIO
+from itertools import chain, repeat
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Callable, Iterable, Iterator, Optional
 
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 
 from PIL import Image, ImageTk
+import numpy as np
 import pandas as pd
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+from pandas.io.parsers.readers import STR_NA_VALUES
 import pdfplumber
+from pdfminer.pdfdevice import PDFTextDevice
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdffont import PDFUnicodeNotDefined
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
 import openpyxl
-from openpyxl.cell.cell import MergedCell
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC, MergedCell
 from openpyxl.styles import Alignment, Font, PatternFill
 from openpyxl.utils import get_column_letter
 
@@ -182,6 +205,81 @@ class ProcessingWindow:
             self.window.destroy()
         self.window.after(0, _close)
 
+# ==========================
+#  Imagen: se decodifica una vez
+#  El archivo se lee y decodifica una sola vez por sesión; de ahí salen la
+#  miniatura de la UI y los bytes que se incrustan en cada hoja, reducidos al
+#  tamaño en que se muestran.
+# ==========================
+
+def _escala_imagen() -> float:
+    """Píxeles incrustados por píxel mostrado (APP_IMAGEN_ESCALA). Por defecto 2:
+    la imagen sigue nítida al imprimir o con zoom."""
+    env = os.environ.get("APP_IMAGEN_ESCALA", "").strip()
+    try:
+        return max(float(env), 1.0) if env else 2.0
+    except ValueError:
+        return 2.0
+
+ESCALA_IMAGEN = _escala_imagen()
+
+# Formatos que openpyxl incrusta tal cual (el resto lo convierte a PNG al guardar)
+FORMATOS_INCRUSTABLES = ("PNG", "JPEG", "GIF")
+
+
+class ImagenIncrustable:
+    """Imagen leída y decodificada una vez, con sus variantes ya calculadas."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.original = f.read()
+        with Image.open(BytesIO(self.original)) as img:
+            self.formato = (img.format or "PNG").upper()
+            img.load()
+            self.imagen = img.copy()
+        self.tamano = self.imagen.size
+        self._reducidas: dict[tuple[int, int], bytes] = {}
+        self._miniaturas: dict[int, Image.Image] = {}
+
+    def bytes_para(self, ancho: float, alto: float) -> bytes:
+        """Bytes para mostrar a `ancho` x `alto` px. Excel estira la imagen a ese
+        tamaño, así que cada eje se reduce por separado y nunca se amplía."""
+        w, h = self.tamano
+        objetivo = (min(w, max(1, round(ancho * ESCALA_IMAGEN))), min(h, max(1, round(alto * ESCALA_IMAGEN))))
+        if objetivo == (w, h) and self.formato in FORMATOS_INCRUSTABLES:
+            return self.original
+        if objetivo not in self._reducidas:
+            img = self.imagen
+            if img.mode not in ("RGB", "RGBA", "L", "LA"):
+                img = img.convert("RGBA")
+            if objetivo != (w, h):
+                img = img.resize(objetivo, Image.LANCZOS, reducing_gap=3.0)
+            buf = BytesIO()
+            if self.formato == "JPEG":
+                img.convert("RGB").save(buf, format="JPEG", quality=90)
+            else:
+                img.save(buf, format="PNG")
+            self._reducidas[objetivo] = buf.getvalue()
+        return self._reducidas[objetivo]
+
+    def miniatura(self, lado: int) -> Image.Image:
+        if lado not in self._miniaturas:
+            img = self.imagen.copy()
+            img.thumbnail((lado, lado))
+            self._miniaturas[lado] = img
+        return self._miniaturas[lado]
+
+# (ruta, mtime, tamaño) -> imagen ya decodificada en esta sesión
+_IMAGENES: dict[tuple[str, int, int], ImagenIncrustable] = {}
+
+
+def imagen_incrustable(path: str) -> ImagenIncrustable:
+    st = os.stat(path)
+    clave = (str(Path(path).resolve()), st.st_mtime_ns, st.st_size)
+    if clave not in _IMAGENES:
+        _IMAGENES[clave] = ImagenIncrustable(path)
+    return _IMAGENES[clave]
+
 # ==========================
 #  UI: Preview / cambio imagen
 # ==========================
@@ -190,9 +288,7 @@ def mostrar_preview(path: str, label: tk.Label) -> None:
     try:
         if not path or not os.path.exists(path):
             raise FileNotFoundError(path or "(vacío)")
-        img = Image.open(path)
-        img.thumbnail((120, 120))
-        photo = ImageTk.PhotoImage(img)
+        photo = ImageTk.PhotoImage(imagen_incrustable(path).miniatura(120))
         label.config(image=photo, text="")
         label.image = photo  # evitar GC
     except Exception:
@@ -283,182 +379,1159 @@ def pedir_case_qty_por_estilo(root: tk.Tk, estilos: Iterable[str], valores_defau
     top.wait_window()
     return result
 
+# ==========================
+#  PDF: backends de texto
+# ==========================
+# Sesión = PDF abierto una sola vez: len(), texto(i), iter_textos(desde), close().
+#  - "pdfplumber": page.extract_text() con análisis de layout (por defecto).
+#  - "pdfminer": corridas de texto del intérprete de pdfminer, sin objetos por
+#    carácter; líneas y palabras con las tolerancias de extract_text() (3 pt).
+
+class SesionPdf(abc.ABC):
+    nombre = ""
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abc.abstractmethod
+    def texto(self, idx: int) -> str:
+        ...
+
+    def close(self) -> None:
+        pass
+
+    def activar_recorte(self, es_linea_tabla: Callable[[str], bool]) -> None:
+        """Indica que el resto de páginas es una tabla (Matricial); por defecto no hace nada."""
+
+    def iter_textos(self, desde: int = 0) -> Iterator[str]:
+        for idx in range(desde, len(self)):
+            yield self.texto(idx)
+
+    def __enter__(self) -> "SesionPdf":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class SesionPdfplumber(SesionPdf):
+    nombre = "pdfplumber"
+
+    def __init__(self, pdf_path: str):
+        self._doc = pdfplumber.open(pdf_path)
+        self._es_linea_tabla: Optional[Callable[[str], bool]] = None
+        # (ancho, alto) de página -> (top, bottom, firma de lo que queda fuera) o None
+        self._recortes: dict[tuple[int, int], Optional[tuple[float, float, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc.pages)
+
+    def activar_recorte(self, es_linea_tabla: Callable[[str], bool]) -> None:
+        if RECORTE_MATRICIAL:
+            self._es_linea_tabla = es_linea_tabla
+
+    def texto(self, idx: int) -> str:
+        """Texto de la página; la libera tras leerla."""
+        page = self._doc.pages[idx]
+        try:
+            # la primera página trae la cabecera del reporte: siempre entera
+            if self._es_linea_tabla is None or idx == 0:
+                return page.extract_text() or ""
+            return self._texto_recortado(page, idx)
+        finally:
+            page.close()
+
+    def _recorte(self, page: "pdfplumber.page.Page", idx: int) -> Optional[tuple[float, float, str]]:
+        """Franja medida una vez por formato de página (ancho x alto), siempre en la
+        primera página con ese formato a partir de la segunda: así cada proceso que
+        lee un bloque del mismo PDF usa la misma franja y el texto no depende del reparto.
+        """
+        formato = (round(page.width), round(page.height))
+        if formato not in self._recortes:
+            recorte = None
+            for i in range(1, len(self._doc.pages)):
+                ref = page if i == idx else self._doc.pages[i]
+                if (round(ref.width), round(ref.height)) != formato:
+                    continue
+                banda = _banda_tabla(ref, self._es_linea_tabla)
+                if banda is not None:
+                    recorte = (*banda, _separar_banda(ref.chars, *banda)[1])
+                if ref is not page:
+                    ref.close()
+                break
+            self._recortes[formato] = recorte
+        return self._recortes[formato]
+
+    def _texto_recortado(self, page: "pdfplumber.page.Page", idx: int) -> str:
+        """Sólo la franja de la tabla: el análisis de layout corre sobre los
+        caracteres de la franja si lo que queda fuera (cabecera/pie) coincide
+        con lo medido; si no, sobre la página entera.
+        """
+        recorte = self._recorte(page, idx)
+        if recorte is None:
+            return page.extract_text() or ""
+
+        top, bottom, firma = recorte
+        dentro, fuera = _separar_banda(page.chars, top, bottom)
+        if fuera != firma:
+            return page.extract_text() or ""
+        return pdfplumber.utils.chars_to_textmap(
+            dentro, layout_bbox=page.bbox, layout_width=page.width, layout_height=page.height
+        ).as_string
+
+    def close(self) -> None:
+        self._doc.close()
+
+
+def _banda_tabla(page: "pdfplumber.page.Page", es_linea_tabla: Callable[[str], bool]) -> Optional[tuple[float, float]]:
+    """(top, bottom) de la tabla: desde justo bajo la cabecera hasta antes del pie
+    (primer salto grande tras la última línea de datos). None si no hay datos.
+    """
+    lineas = page.extract_text_lines(return_chars=False)
+    idx = [i for i, ln in enumerate(lineas) if es_linea_tabla(ln["text"])]
+    if not idx:
+        return None
+    i0, i1 = idx[0], idx[-1]
+    top = page.bbox[1]
+    if i0 > 0:
+        top = (lineas[i0 - 1]["bottom"] + lineas[i0]["top"]) / 2
+    bottom = page.bbox[3]
+    for j in range(i1 + 1, len(lineas)):
+        alto = lineas[j]["bottom"] - lineas[j]["top"]
+        if lineas[j]["top"] - lineas[j - 1]["bottom"] > 2 * alto:
+            bottom = (lineas[j - 1]["bottom"] + lineas[j]["top"]) / 2
+            break
+    return top, bottom
+
+
+def _separar_banda(chars: list[dict], top: float, bottom: float) -> tuple[list[dict], str]:
+    """(caracteres dentro de la franja, firma de los de fuera). En la firma cada
+    tramo de dígitos cuenta como "#": es igual en todas las páginas (nº de
+    página, fechas...) salvo que haya datos fuera de la franja.
+    """
+    dentro: list[dict] = []
+    partes: list[str] = []
+    digito = False
+    for c in chars:
+        if top <= c["bottom"] and c["top"] <= bottom:
+            dentro.append(c)
+            continue
+        if c["text"].isdigit():
+            if not digito:
+                partes.append("#")
+            digito = True
+        else:
+            partes.append(c["text"])
+            digito = False
+    return dentro, "".join(partes)
+
+
+class _DispositivoCorridas(PDFTextDevice):
+    """Device de pdfminer que sólo anota (top, x0, x1, texto) por carácter."""
+
+    def __init__(self, rsrcmgr: PDFResourceManager):
+        super().__init__(rsrcmgr)
+        self.chars: list[tuple[float, float, float, str]] = []
+
+    def render_char(self, matrix, font, fontsize, scaling, rise, cid, ncs, graphicstate) -> float:
+        try:
+            text = font.to_unichr(cid)
+        except PDFUnicodeNotDefined:
+            text = ""
+        adv = font.char_width(cid) * fontsize * scaling
+        x0 = matrix[4]
+        self.chars.append((-matrix[5], x0, x0 + adv * matrix[0], text))
+        return adv
+
+
+def _texto_de_corridas(chars: list[tuple[float, float, float, str]], tolerancia: float = 3) -> str:
+    """Agrupa líneas por cercanía vertical y palabras por hueco horizontal, como pdfplumber."""
+    if not chars:
+        return ""
+    grupo: dict[float, int] = {}
+    n_linea: int = 0
+    ultimo: Optional[float] = None
+    for top in sorted({c[0] for c in chars}):
+        if ultimo is not None and top > ultimo + tolerancia:
+            n_linea += 1
+        grupo[top] = n_linea
+        ultimo = top
+
+    lineas: list[list[tuple[float, float, float, str]]] = [[] for _ in range(n_linea + 1)]
+    for c in chars:
+        lineas[grupo[c[0]]].append(c)
+
+    salida: list[str] = []
+    for linea in lineas:
+        palabras: list[str] = []
+        actual: list[str] = []
+        ax = bx = 0.0
+        for _, x0, x1, text in sorted(linea, key=lambda c: (c[1], c[0])):
+            if text.isspace():
+                if actual:
+                    palabras.append("".join(actual))
+                actual = []
+                continue
+            if actual and (x0 < ax or x0 > bx + tolerancia):
+                palabras.append("".join(actual))
+                actual = []
+            actual.append(text)
+            ax, bx = x0, x1
+        if actual:
+            palabras.append("".join(actual))
+        salida.append(" ".join(palabras))
+    return "\n".join(salida)
+
+
+class SesionPdfminer(SesionPdf):
+    nombre = "pdfminer"
+
+    def __init__(self, pdf_path: str):
+        self._fp = open(pdf_path, "rb")
+        try:
+            doc = PDFDocument(PDFParser(self._fp))
+            self._pages = list(PDFPage.create_pages(doc))
+        except Exception:
+            self._fp.close()
+            raise
+        rsrcmgr = PDFResourceManager(caching=True)
+        self._device = _DispositivoCorridas(rsrcmgr)
+        self._interp = PDFPageInterpreter(rsrcmgr, self._device)
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def texto(self, idx: int) -> str:
+        self._device.chars = []
+        self._interp.process_page(self._pages[idx])
+        return _texto_de_corridas(self._device.chars)
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+BACKENDS_PDF: dict[str, type[SesionPdf]] = {
+    "pdfplumber": SesionPdfplumber,
+    "pdfminer": SesionPdfminer,
+}
+
+
+def _backend_env(var: str, defecto: str) -> str:
+    valor = os.environ.get(var, "").strip().lower()
+    return valor if valor in BACKENDS_PDF else defecto
+
+# APP_PDF_BACKEND: detección de formato (y "Desconocido");
+# APP_PDF_BACKEND_BARRAS / APP_PDF_BACKEND_MATRICIAL: backend de cada formato.
+BACKEND_PDF_DEFECTO = _backend_env("APP_PDF_BACKEND", "pdfplumber")
+BACKEND_POR_FORMATO: dict[str, str] = {
+    "Barras": _backend_env("APP_PDF_BACKEND_BARRAS", BACKEND_PDF_DEFECTO),
+    "Matricial": _backend_env("APP_PDF_BACKEND_MATRICIAL", BACKEND_PDF_DEFECTO),
+}
+
+# APP_PDF_RECORTE=1 activa el recorte a la franja de la tabla (Matricial, pdfplumber).
+# Desactivado por defecto: pdfplumber arma page.chars de la página entera igual
+# (la firma de fuera de la franja también los necesita) y no se mide mejora.
+RECORTE_MATRICIAL = os.environ.get("APP_PDF_RECORTE", "0").strip() == "1"
+
+
+def abrir_pdf(pdf_path: str, backend: Optional[str] = None) -> SesionPdf:
+    return BACKENDS_PDF[backend or BACKEND_PDF_DEFECTO](pdf_path)
+
+# ==========================
+#  Registros PDF por columnas
+#  Una lista por columna en vez de un dict por UPC; estilo, color, talla y
+#  "STYLE COLOR" se internan (un solo objeto por valor distinto).
+# ==========================
+
+COLUMNAS_REGISTRO = ["STYLE", "COLOR CODE", "COLOR NAME", "SIZE", "UPC CODE", "STYLE COLOR"]
+
+
+class RegistrosPDF:
+    """Buffer columnar de registros PDF; `to_dataframe()` no pasa por dicts por fila."""
+
+    __slots__ = ("columnas", "_listas", "_style_color")
+
+    def __init__(self, columnas: Optional[dict[str, list[str]]] = None):
+        self.columnas = columnas if columnas is not None else {c: [] for c in COLUMNAS_REGISTRO}
+        self._listas = tuple(self.columnas[c] for c in COLUMNAS_REGISTRO)
+        self._style_color: dict[tuple[str, str], str] = {}
+
+    def __len__(self) -> int:
+        return len(self.columnas["UPC CODE"])
+
+    def __iter__(self) -> Iterator[dict[str, str]]:
+        """Filas como dicts (compatibilidad)."""
+        for fila in zip(*self._listas):
+            yield dict(zip(COLUMNAS_REGISTRO, fila))
+
+    def __eq__(self, otro) -> bool:
+        return isinstance(otro, RegistrosPDF) and self.columnas == otro.columnas
+
+    def __reduce__(self):
+        # Entre procesos sólo viajan las columnas (pickle guarda una vez cada texto internado)
+        return (RegistrosPDF, (self.columnas,))
+
+    def _clave_style_color(self, style: str, color_code: str) -> str:
+        clave = self._style_color.get((style, color_code))
+        if clave is None:
+            clave = self._style_color[(style, color_code)] = sys.intern(f"{style} {color_code}")
+        return clave
+
+    def agregar(self, style: str, color_code: str, color_name: str, size: str, upc: str) -> None:
+        """Una fila (Barras)."""
+        style, color_code = sys.intern(style), sys.intern(color_code)
+        c_style, c_code, c_name, c_size, c_upc, c_sc = self._listas
+        c_style.append(style)
+        c_code.append(color_code)
+        c_name.append(sys.intern(color_name))
+        c_size.append(sys.intern(size))
+        c_upc.append(upc)
+        c_sc.append(self._clave_style_color(style, color_code))
+
+    def agregar_color(self, style: str, color_code: str, color_name: str, tallas: list[str], upcs: list[str]) -> None:
+        """Una línea de color Matricial (una fila por talla con UPC); `style`/`tallas` ya internados."""
+        n = min(len(tallas), len(upcs))
+        if not n:
+            return
+        color_code, color_name = sys.intern(color_code), sys.intern(color_name)
+        c_style, c_code, c_name, c_size, c_upc, c_sc = self._listas
+        c_style.extend([style] * n)
+        c_code.extend([color_code] * n)
+        c_name.extend([color_name] * n)
+        c_size.extend(tallas[:n])
+        c_upc.extend(upcs[:n])
+        c_sc.extend([self._clave_style_color(style, color_code)] * n)
+
+    def extend(self, otro: "RegistrosPDF") -> None:
+        for propia, ajena in zip(self._listas, otro._listas):
+            propia.extend(ajena)
+
+    def filtrar_estilos(self, estilos: frozenset[str]) -> "RegistrosPDF":
+        """Sólo las filas cuyo STYLE está en `estilos`."""
+        filas = [i for i, style in enumerate(self.columnas["STYLE"]) if style in estilos]
+        return RegistrosPDF({c: [v[i] for i in filas] for c, v in self.columnas.items()})
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.columnas, columns=COLUMNAS_REGISTRO)
+
 # ==========================
 #  PDF: detección / extracción
 # ==========================
 
+def leer_textos_pdf(pdf_path: str, backend: Optional[str] = None) -> list[str]:
+    """Abre el PDF una sola vez y extrae el texto de cada página una sola vez."""
+    with abrir_pdf(pdf_path, backend) as sesion:
+        return list(sesion.iter_textos())
+
+
+def detectar_formato_texto(text: str) -> str:
+    if "Division|" in text:
+        return "Barras"
+    if "UPC REPORT" in text:
+        return "Matricial"
+    return "Desconocido"
+
+
 def detectar_formato(pdf_path: str) -> str:
     try:
-        with pdfplumber.open(pdf_path) as doc:
-            text = (doc.pages[0].extract_text() or "")
-            if "Division|" in text:
-                return "Barras"
-            if "UPC REPORT" in text:
-                return "Matricial"
+        with abrir_pdf(pdf_path) as sesion:
+            return detectar_formato_texto(sesion.texto(0))
     except Exception:
         pass
     return "Desconocido"
 
 
-def extract_data_barras(pdf_path: str) -> list[dict[str, str]]:
-    data: list[dict[str, str]] = []
-    with pdfplumber.open(pdf_path) as doc:
-        full_text = "\n".join([page.extract_text() or "" for page in doc.pages])
-    lines = [ln.strip() for ln in full_text.split("\n") if ln.strip()]
-    for line in lines:
-        if "Division|" in line and "Style|" in line and "UPC|" in line:
+def _iter_filas_barras(textos: Iterable[str], estilos: Optional[frozenset[str]] = None) -> Iterator[tuple[str, str, str, str, str]]:
+    """Filas Barras (style, color_code, color_name, size, upc) página a página;
+    con `estilos` se descartan las líneas de otros estilos antes de armar la fila.
+    """
+    for text in textos:
+        for ln in text.split("\n"):
+            line = ln.strip()
+            if not line:
+                continue
+            if "Division|" in line and "Style|" in line and "UPC|" in line:
+                continue
+            if "|" not in line:
+                continue
+            parts = [p.strip() for p in line.split("|")]
+            if len(parts) < 8:
+                continue
+            if estilos is not None and parts[1].upper() not in estilos:
+                continue
+            _, style, upc, _, color_code, color_name, _, size = parts[:8]
+            upc_clean = upc if upc.isdecimal() else re.sub(r"\D", "", upc)
+            if not upc_clean:
+                continue
+            yield (
+                str(style).strip().upper(),
+                str(color_code).strip().upper(),
+                str(color_name).strip().upper(),
+                str(size).strip().upper(),
+                upc_clean,
+            )
+
+
+def iter_data_barras(textos: Iterable[str]) -> Iterator[dict[str, str]]:
+    """Generador: registros Barras página a página (sin texto completo ni lista intermedia)."""
+    for style, color_code, color_name, size, upc in _iter_filas_barras(textos):
+        yield {
+            "STYLE": style,
+            "COLOR CODE": color_code,
+            "COLOR NAME": color_name,
+            "SIZE": size,
+            "UPC CODE": upc,
+            "STYLE COLOR": f"{style} {color_code}",
+        }
+
+
+def iter_data_barras_pdf(pdf_path: str, backend: Optional[str] = None) -> Iterator[dict[str, str]]:
+    """Versión perezosa sobre el archivo (p. ej. para `pd.DataFrame.from_records` o la caché)."""
+    with abrir_pdf(pdf_path, backend or BACKEND_POR_FORMATO["Barras"]) as sesion:
+        yield from iter_data_barras(sesion.iter_textos())
+
+
+def parse_data_barras(textos: Iterable[str], estilos: Optional[frozenset[str]] = None) -> RegistrosPDF:
+    registros = RegistrosPDF()
+    agregar = registros.agregar
+    for fila in _iter_filas_barras(textos, estilos):
+        agregar(*fila)
+    return registros
+
+
+def extract_data_barras(pdf_path: str) -> RegistrosPDF:
+    with abrir_pdf(pdf_path, BACKEND_POR_FORMATO["Barras"]) as sesion:
+        return parse_data_barras(sesion.iter_textos())
+
+
+MATRICIAL_STYLE_RE = re.compile(r"^(TP\d+[A-Z]?)\b")
+MATRICIAL_SIZE_TOKEN = re.compile(r"\*+\s*([A-Z0-9/]+)\s*\*+")
+MATRICIAL_COLOR_LINE = re.compile(r"^([A-Z0-9]{3,4})\s+([A-Z0-9/ .\-]+?)(?:\s+((?:\d{11,14}\s+)*\d{11,14}))?\s*$")
+MATRICIAL_NUMBERS_ONLY = re.compile(r"^(?:\d{11,14}\s+)*\d{11,14}$")
+# MATRICIAL_COLOR_LINE por cadenas (sin regex ni backtracking)
+MATRICIAL_COLOR_CODE_LEN = (3, 4)
+_MAYUSCULAS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+_CODIGO_COLOR = _MAYUSCULAS | frozenset("0123456789")
+_NOMBRE_COLOR = _CODIGO_COLOR | frozenset("/ .-")
+
+# Páginas mínimas para repartir un único PDF Matricial entre procesos
+MIN_PAGINAS_PARALELO = 8
+
+
+def _parse_linea_color(line: str) -> Optional[tuple[str, str, list[str]]]:
+    """Equivale a `MATRICIAL_COLOR_LINE.match` en tiempo lineal: código, nombre
+    (con su espaciado interno) y el sufijo más largo de tokens UPC de 11-14 dígitos
+    (el nombre "perezoso" de la regex deja a los UPCs todo lo que puedan tomar).
+    """
+    toks = line.split()
+    codigo = toks[0]
+    lo, hi = MATRICIAL_COLOR_CODE_LEN
+    if len(toks) < 2 or not lo <= len(codigo) <= hi or not _CODIGO_COLOR.issuperset(codigo):
+        return None
+    n = 0
+    max_upcs = len(toks) - 2
+    while n < max_upcs:
+        tok = toks[-1 - n]
+        if not (11 <= len(tok) <= 14 and tok.isdecimal()):
+            break
+        n += 1
+    cabeza = line.rsplit(None, n)[0] if n else line
+    nombre = cabeza[len(codigo):].strip()
+    if not _NOMBRE_COLOR.issuperset(nombre):
+        return None
+    return codigo, nombre, toks[len(toks) - n:]
+
+
+_LINEA_SIN_DATOS = ("",)
+
+
+def clasificar_linea_matricial(line: str) -> tuple:
+    """Clasifica una línea (ya sin blancos en los extremos) una única vez.
+    Primero comprobaciones baratas de prefijo; la regex sólo si hace falta:
+    - ("S", estilo, tallas) / ("C", código, nombre, upcs)
+    - ("N", upcs): sólo UPCs (continuación de un color)
+    - ("T", tallas): tallas sueltas (continuación de un estilo)
+    - ("",): cualquier otra cosa (vacía, separadores, cabeceras...)
+    """
+    if not line:
+        return _LINEA_SIN_DATOS
+    c0 = line[0]
+    if len(line) > 2 and c0 in _MAYUSCULAS and line[1] in _MAYUSCULAS and line[2].isdecimal():
+        m_style = MATRICIAL_STYLE_RE.match(line)
+        if m_style:
+            tallas = MATRICIAL_SIZE_TOKEN.findall(line) if "*" in line else []
+            return ("S", m_style.group(1).upper(), tallas)
+    if c0.isdecimal() and line[:11].isdecimal() and MATRICIAL_NUMBERS_ONLY.match(line):
+        return ("N", line.split())
+    if c0 in _CODIGO_COLOR:
+        color = _parse_linea_color(line)
+        if color:
+            return ("C", *color)
+    if "*" in line:
+        tallas = MATRICIAL_SIZE_TOKEN.findall(line)
+        if tallas:
+            return ("T", tallas)
+    return _LINEA_SIN_DATOS
+
+
+def _es_prefijo_estilo(line: str) -> bool:
+    """Dos mayúsculas y un dígito: única forma en que empieza una línea de estilo."""
+    return len(line) > 2 and line[0] in _MAYUSCULAS and line[1] in _MAYUSCULAS and line[2].isdecimal()
+
+
+def tokenizar_pagina_matricial(text: str, estilos: Optional[frozenset[str]] = None) -> list[tuple]:
+    """Tokeniza una página sin estado previo: eventos ("S", estilo, tallas) y
+    ("C", código, nombre, upcs). El estilo vigente se resuelve en `ensamblar_matricial`.
+    Una sola pasada: cada línea se clasifica una vez; las continuaciones
+    ("T" tras un estilo, "N" tras un color) se agregan al último evento abierto.
+    Con `estilos`, un estilo ajeno se emite sin tallas y su bloque se salta hasta el próximo estilo.
+    """
+    eventos: list[tuple] = []
+    abierto = ""  # "S" / "C": el último evento aún acepta continuaciones
+    saltando = False
+    for raw in text.split("\n"):
+        line = raw.strip()
+        if saltando and not _es_prefijo_estilo(line):
             continue
-        if "|" not in line:
+        ev = clasificar_linea_matricial(line)
+        tipo = ev[0]
+        if abierto == "S" and tipo == "T":
+            eventos[-1][2].extend(ev[1])
             continue
-        parts = [p.strip() for p in line.split("|")]
-        if len(parts) < 8:
+        if abierto == "C" and tipo == "N":
+            eventos[-1][3].extend(ev[1])
             continue
-        _, style, upc, _, color_code, color_name, _, size = parts[:8]
-        upc_clean = re.sub(r"\D", "", upc)
-        if not upc_clean or not upc_clean.isdigit():
+        abierto = ""
+        if tipo == "S" and estilos is not None:
+            saltando = ev[1] not in estilos
+            if saltando:
+                eventos.append(("S", ev[1], []))
+                continue
+        if saltando:
             continue
-        row = {
-            "STYLE": str(style).strip().upper(),
-            "COLOR CODE": str(color_code).strip().upper(),
-            "COLOR NAME": str(color_name).strip().upper(),
-            "SIZE": str(size).strip().upper(),
-            "UPC CODE": upc_clean,
-            "STYLE COLOR": f"{str(style).strip().upper()} {str(color_code).strip().upper()}",
-        }
-        data.append(row)
-    return data
+        if tipo == "S" or tipo == "C":
+            eventos.append(ev)
+            abierto = tipo
+    return eventos
+
+
+def es_linea_matricial(text: str) -> bool:
+    """Línea con datos de la tabla: estilo, color con UPCs o continuación de UPCs."""
+    ev = clasificar_linea_matricial(text.strip())
+    return ev[0] in ("S", "N") or (ev[0] == "C" and bool(ev[3]))
 
 
-def extract_data_matricial(pdf_path: str) -> list[dict[str, str]]:
-    registros: list[dict[str, str]] = []
+def ensamblar_matricial(eventos_por_pagina: Iterable[list[tuple]]) -> RegistrosPDF:
+    """Paso secuencial: lleva estilo/tallas vigentes de página en página (como el parser serial).
+    Estilo y tallas se internan una vez por estilo, no una vez por UPC.
+    """
+    registros = RegistrosPDF()
     style_actual: Optional[str] = None
     tallas_actuales: list[str] = []
 
-    style_re = re.compile(r"^(TP\d+[A-Z]?)\b")
-    size_token = re.compile(r"\*+\s*([A-Z0-9/]+)\s*\*+")
-    color_line = re.compile(r"^([A-Z0-9]{3,4})\s+([A-Z0-9/ .\-]+?)(?:\s+((?:\d{11,14}\s+)*\d{11,14}))?\s*$")
-    numbers_only = re.compile(r"^(?:\d{11,14}\s+)*\d{11,14}$")
-
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text() or ""
-            raw_lines = [ln.rstrip() for ln in text.split("\n")]
-            i = 0
-            while i < len(raw_lines):
-                line = raw_lines[i].strip()
-                if not line or line.startswith("-") or line.startswith("*"):
-                    i += 1
-                    continue
-
-                m_style = style_re.match(line)
-                if m_style:
-                    style_actual = m_style.group(1).upper()
-                    tallas_actuales = size_token.findall(line)
-                    j = i + 1
-                    while j < len(raw_lines):
-                        nxt = raw_lines[j].strip()
-                        if not nxt:
-                            break
-                        if style_re.match(nxt) or color_line.match(nxt):
-                            break
-                        extra_sizes = size_token.findall(nxt)
-                        if not extra_sizes:
-                            break
-                        tallas_actuales.extend(extra_sizes)
-                        j += 1
-                    i = j
-                    continue
+    for eventos in eventos_por_pagina:
+        for ev in eventos:
+            if ev[0] == "S":
+                style_actual = sys.intern(ev[1])
+                tallas_actuales = [sys.intern(t.upper()) for t in ev[2]]
+                continue
 
-                m_color = color_line.match(line)
-                if m_color and style_actual and tallas_actuales:
-                    color_code = m_color.group(1).upper()
-                    color_name = m_color.group(2).strip().upper()
-                    upcs: list[str] = []
-                    if m_color.group(3):
-                        upcs.extend(m_color.group(3).split())
-                    k = i + 1
-                    while k < len(raw_lines):
-                        nxt = raw_lines[k].strip()
-                        if numbers_only.match(nxt):
-                            upcs.extend(nxt.split())
-                            k += 1
-                            continue
-                        if color_line.match(nxt) or style_re.match(nxt):
-                            break
-                        if not nxt:
-                            break
-                        break
-                    n = min(len(tallas_actuales), len(upcs))
-                    for idx in range(n):
-                        registros.append(
-                            {
-                                "STYLE": style_actual,
-                                "COLOR CODE": color_code,
-                                "COLOR NAME": color_name,
-                                "SIZE": tallas_actuales[idx].upper(),
-                                "UPC CODE": upcs[idx],
-                                "STYLE COLOR": f"{style_actual} {color_code}",
-                            }
-                        )
-                    i = k
-                    continue
+            _, color_code, color_name, upcs = ev
+            if not (style_actual and tallas_actuales):
+                continue
+            registros.agregar_color(style_actual, color_code, color_name, tallas_actuales, upcs)
 
-                i += 1
     return registros
 
 
-def extract_data_from_pdf(pdf: str) -> list[dict[str, str]]:
-    tipo = detectar_formato(pdf)
+def parse_data_matricial(textos: list[str], estilos: Optional[frozenset[str]] = None) -> RegistrosPDF:
+    return ensamblar_matricial(tokenizar_pagina_matricial(text, estilos) for text in textos)
+
+
+def extract_data_matricial(pdf_path: str) -> RegistrosPDF:
+    with abrir_pdf(pdf_path, BACKEND_POR_FORMATO["Matricial"]) as sesion:
+        sesion.activar_recorte(es_linea_matricial)
+        textos = list(sesion.iter_textos())
+    return parse_data_matricial(textos)
+
+
+def parse_data_from_textos(textos: list[str], estilos: Optional[frozenset[str]] = None) -> RegistrosPDF:
+    tipo = detectar_formato_texto(textos[0] if textos else "")
     if tipo == "Barras":
-        return extract_data_barras(pdf)
-    rows = extract_data_matricial(pdf)
+        return parse_data_barras(textos, estilos)
+    rows = parse_data_matricial(textos, estilos)
     if not rows and tipo == "Desconocido":
-        rows = extract_data_barras(pdf)
+        rows = parse_data_barras(textos, estilos)
     return rows
 
+
+def abrir_pdf_detectando(pdf_path: str) -> tuple[SesionPdf, str, str]:
+    """Abre con el backend por defecto y detecta el formato con la primera página;
+    sólo reabre si ese formato tiene otro backend configurado.
+    Devuelve (sesión abierta, formato, texto de la primera página).
+    """
+    sesion = abrir_pdf(pdf_path)
+    try:
+        primera = sesion.texto(0) if len(sesion) else ""
+        tipo = detectar_formato_texto(primera)
+        backend = BACKEND_POR_FORMATO.get(tipo, sesion.nombre)
+        if backend == sesion.nombre:
+            return sesion, tipo, primera
+    except BaseException:
+        sesion.close()
+        raise
+    sesion.close()
+
+    sesion = abrir_pdf(pdf_path, backend)
+    try:
+        return sesion, tipo, sesion.texto(0) if len(sesion) else ""
+    except BaseException:
+        sesion.close()
+        raise
+
+
+def extract_data_from_pdf(pdf: str, estilos: Optional[frozenset[str]] = None) -> RegistrosPDF:
+    """Abre el PDF una sola vez: detección y parsers usan el mismo texto por página.
+    Los PDFs Barras se recorren en streaming, página a página.
+    Con `estilos` sólo se arman registros de esos estilos.
+    """
+    sesion, tipo, primera = abrir_pdf_detectando(pdf)
+    with sesion:
+        if tipo == "Barras":
+            return parse_data_barras(chain([primera], sesion.iter_textos(1)), estilos)
+        if tipo == "Matricial":
+            sesion.activar_recorte(es_linea_matricial)
+        textos = [primera, *sesion.iter_textos(1)]
+    return parse_data_from_textos(textos, estilos)
+
+
+def _tokenizar_rango_matricial(args: tuple[str, str, int, int, Optional[frozenset[str]]]) -> list[list[tuple]]:
+    """Worker: extrae y tokeniza las páginas [inicio, fin) de un PDF Matricial."""
+    pdf_path, backend, inicio, fin, estilos = args
+    with abrir_pdf(pdf_path, backend) as sesion:
+        sesion.activar_recorte(es_linea_matricial)
+        return [tokenizar_pagina_matricial(sesion.texto(i), estilos) for i in range(inicio, fin)]
+
+
+def extract_data_from_pdf_por_paginas(pdf_path: str, max_workers: int, estilos: Optional[frozenset[str]] = None) -> RegistrosPDF:
+    """Un solo PDF Matricial grande: reparte bloques de páginas entre procesos y ensambla en orden.
+    El resultado es idéntico, fila por fila, al de `extract_data_from_pdf`.
+    """
+    sesion, tipo, primera = abrir_pdf_detectando(pdf_path)
+    with sesion:
+        n_paginas = len(sesion)
+        if max_workers <= 1 or n_paginas < MIN_PAGINAS_PARALELO or tipo != "Matricial":
+            if tipo == "Barras":
+                return parse_data_barras(chain([primera], sesion.iter_textos(1)), estilos)
+            if tipo == "Matricial":
+                sesion.activar_recorte(es_linea_matricial)
+            textos = [primera, *sesion.iter_textos(1)]
+            return parse_data_from_textos(textos, estilos)
+        backend = sesion.nombre
+
+    # Bloques contiguos de páginas (el doble que workers para repartir mejor la carga)
+    n_bloques = min(max_workers * 2, n_paginas - 1)
+    tam = -(-(n_paginas - 1) // n_bloques)
+    rangos = [(pdf_path, backend, i, min(i + tam, n_paginas), estilos) for i in range(1, n_paginas, tam)]
+
+    eventos_por_pagina = [tokenizar_pagina_matricial(primera, estilos)]
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(rangos))) as ex:
+        for bloque in ex.map(_tokenizar_rango_matricial, rangos):
+            eventos_por_pagina.extend(bloque)
+    return ensamblar_matricial(eventos_por_pagina)
+
+# ==========================
+#  Caché local de registros PDF (SQLite)
+# ==========================
+
+# Subir al cambiar cualquier parser: invalida lo guardado con la versión anterior
+PARSER_VERSION = "4"
+
+
+def cache_dir() -> Path:
+    """Carpeta local de cachés (APP_CACHE_DIR o %LOCALAPPDATA% / ~/.cache)."""
+    env_dir = os.environ.get("APP_CACHE_DIR")
+    if env_dir:
+        return Path(env_dir)
+    local = os.environ.get("LOCALAPPDATA")
+    return (Path(local) if local else Path.home() / ".cache") / "uc_cc_cm"
+
+
+def _cache_max_bytes() -> int:
+    """Tope de la caché en MB (APP_CACHE_MAX_MB, 0 = desactivada)."""
+    env = os.environ.get("APP_CACHE_MAX_MB", "").strip()
+    return (int(env) if env.isdigit() else 256) * 1024 * 1024
+
+def _version_cache() -> str:
+    """PARSER_VERSION + opciones que cambian el texto leído (backends, recorte)."""
+    backends = {"*": BACKEND_PDF_DEFECTO, **BACKEND_POR_FORMATO}
+    partes = [PARSER_VERSION] + [f"{k}={v}" for k, v in backends.items() if v != "pdfplumber"]
+    if RECORTE_MATRICIAL:
+        partes.append("recorte=1")
+    return "+".join(partes)
+
+CACHE_PDF_DB = cache_dir() / "case_content_pdf.sqlite"
+CACHE_VERSION = _version_cache()
+CACHE_MAX_BYTES = _cache_max_bytes()
+
+
+def hash_archivo(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _cache_conectar() -> sqlite3.Connection:
+    CACHE_PDF_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(CACHE_PDF_DB), timeout=30)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS registros_pdf ("
+        " hash TEXT NOT NULL, version TEXT NOT NULL, datos BLOB NOT NULL,"
+        " bytes INTEGER NOT NULL, ultimo_uso REAL NOT NULL,"
+        " PRIMARY KEY (hash, version))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS excel_preparado ("
+        " hash TEXT NOT NULL, version TEXT NOT NULL, datos BLOB NOT NULL,"
+        " bytes INTEGER NOT NULL, ultimo_uso REAL NOT NULL,"
+        " PRIMARY KEY (hash, version))"
+    )
+    return conn
+
+
+CACHE_TABLAS = ("registros_pdf", "excel_preparado")
+
+
+def _cache_recortar(conn: sqlite3.Connection) -> None:
+    """Expulsa las entradas menos usadas (de cualquier tabla) hasta quedar bajo el tope."""
+    total = sum(conn.execute(f"SELECT COALESCE(SUM(bytes), 0) FROM {t}").fetchone()[0] for t in CACHE_TABLAS)
+    if total <= CACHE_MAX_BYTES:
+        return
+    consulta = " UNION ALL ".join(f"SELECT '{t}', hash, version, bytes, ultimo_uso FROM {t}" for t in CACHE_TABLAS)
+    for tabla, h, v, b, _ in conn.execute(consulta + " ORDER BY ultimo_uso").fetchall():
+        if total <= CACHE_MAX_BYTES:
+            break
+        conn.execute(f"DELETE FROM {tabla} WHERE hash = ? AND version = ?", (h, v))
+        total -= b
+
+
+def _codificar_columnas(registros: RegistrosPDF) -> dict:
+    """Columnas repetitivas como (valores distintos, códigos); UPC CODE tal cual."""
+    datos: dict = {}
+    for c, valores in registros.columnas.items():
+        if c == "UPC CODE":
+            datos[c] = valores
+            continue
+        indice: dict[str, int] = {}
+        codigos = [indice.setdefault(v, len(indice)) for v in valores]
+        datos[c] = [list(indice), codigos]
+    return datos
+
+
+def _decodificar_columnas(datos: dict) -> RegistrosPDF:
+    columnas: dict[str, list[str]] = {}
+    for c in COLUMNAS_REGISTRO:
+        if c == "UPC CODE":
+            columnas[c] = datos[c]
+            continue
+        valores, codigos = datos[c]
+        valores = [sys.intern(v) for v in valores]
+        columnas[c] = [valores[i] for i in codigos]
+    return RegistrosPDF(columnas)
+
+
+def _version_estilos(estilos: Optional[frozenset[str]]) -> str:
+    """CACHE_VERSION + huella del filtro de estilos."""
+    if estilos is None:
+        return CACHE_VERSION
+    huella = hashlib.sha256("\n".join(sorted(estilos)).encode("utf-8")).hexdigest()[:16]
+    return f"{CACHE_VERSION}+estilos={huella}"
+
+
+def cache_get_registros(hash_pdf: str, estilos: Optional[frozenset[str]] = None) -> Optional[RegistrosPDF]:
+    """Devuelve los registros guardados para ese contenido + CACHE_VERSION, o None
+    (con filtro de estilos y sin ese subconjunto guardado, filtra la entrada completa).
+    """
+    if CACHE_MAX_BYTES <= 0:
+        return None
+    try:
+        with closing(_cache_conectar()) as conn, conn:
+            versiones = [_version_estilos(estilos)] + ([CACHE_VERSION] if estilos is not None else [])
+            for version in versiones:
+                fila = conn.execute(
+                    "SELECT datos FROM registros_pdf WHERE hash = ? AND version = ?",
+                    (hash_pdf, version),
+                ).fetchone()
+                if fila is not None:
+                    break
+            else:
+                return None
+            conn.execute(
+                "UPDATE registros_pdf SET ultimo_uso = ? WHERE hash = ? AND version = ?",
+                (time.time(), hash_pdf, version),
+            )
+        registros = _decodificar_columnas(json.loads(zlib.decompress(fila[0])))
+        return registros if version == _version_estilos(estilos) else registros.filtrar_estilos(estilos)
+    except Exception as e:
+        print(f"Caché PDF no disponible: {e}")
+        return None
+
+
+def cache_put_registros(hash_pdf: str, registros: RegistrosPDF, estilos: Optional[frozenset[str]] = None) -> None:
+    """Guarda los registros y expulsa los menos usados si se pasa del tope (LRU por tamaño)."""
+    if CACHE_MAX_BYTES <= 0:
+        return
+    try:
+        columnas = _codificar_columnas(registros)
+        datos = zlib.compress(json.dumps(columnas, separators=(",", ":")).encode("utf-8"))
+        with closing(_cache_conectar()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO registros_pdf VALUES (?, ?, ?, ?, ?)",
+                (hash_pdf, _version_estilos(estilos), datos, len(datos), time.time()),
+            )
+            _cache_recortar(conn)
+    except Exception as e:
+        print(f"No se pudo guardar en la caché PDF: {e}")
+
+
+def purgar_cache() -> None:
+    """Vacía la caché de registros PDF y de Excel preparados (`--purgar-cache`)."""
+    if CACHE_PDF_DB.exists():
+        with closing(_cache_conectar()) as conn:
+            for tabla in CACHE_TABLAS:
+                conn.execute(f"DELETE FROM {tabla}")
+            conn.commit()
+            conn.execute("VACUUM")
+
+# ==========================
+#  Índice maestro de UPC (misma base SQLite)
+#  estilo / color / talla -> UPC de todos los PDFs ya procesados. No cuenta
+#  para el tope de la caché ni se borra con --purgar-cache.
+# ==========================
+
+# APP_INDICE_UPC=0: ni se actualiza ni se ofrece resolver sin PDFs
+INDICE_UPC = os.environ.get("APP_INDICE_UPC", "1").strip() != "0"
+
+
+def _indice_conectar() -> sqlite3.Connection:
+    """Un UPC por (estilo, color, talla): si el PDF le asigna otro, el último reemplaza al anterior."""
+    conn = _cache_conectar()
+    clave = [f[1] for f in conn.execute("PRAGMA table_info(indice_upc)") if f[5]]
+    if "upc" in clave:
+        # Índice anterior con el UPC dentro de la clave: se queda el más reciente de cada talla
+        conn.execute("ALTER TABLE indice_upc RENAME TO indice_upc_anterior")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS indice_upc ("
+        " style TEXT NOT NULL, color_code TEXT NOT NULL, color_name TEXT NOT NULL,"
+        " size TEXT NOT NULL, upc TEXT NOT NULL, style_color TEXT NOT NULL, visto REAL NOT NULL,"
+        " PRIMARY KEY (style, color_code, color_name, size)) WITHOUT ROWID"
+    )
+    if "upc" in clave:
+        conn.execute("INSERT OR REPLACE INTO indice_upc SELECT * FROM indice_upc_anterior ORDER BY visto")
+        conn.execute("DROP TABLE indice_upc_anterior")
+        conn.commit()
+    conn.execute("CREATE INDEX IF NOT EXISTS indice_upc_codigo ON indice_upc (style, color_code, size)")
+    conn.execute("CREATE INDEX IF NOT EXISTS indice_upc_nombre ON indice_upc (style, color_name, size)")
+    return conn
+
+
+def indice_upc_guardar(df_pdfs: pd.DataFrame) -> None:
+    """Suma al índice los registros PDF, ya normalizados por claves_categoricas."""
+    if not INDICE_UPC or df_pdfs.empty:
+        return
+    filas = df_pdfs[COLUMNAS_REGISTRO].dropna().drop_duplicates()
+    visto = time.time()
+    try:
+        with closing(_indice_conectar()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO indice_upc VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((*fila, visto) for fila in filas.itertuples(index=False, name=None)),
+            )
+    except Exception as e:
+        print(f"No se pudo actualizar el índice de UPC: {e}")
+
+
+def indice_upc_registros(estilos: Iterable[str]) -> RegistrosPDF:
+    """Registros del índice para esos estilos (modo sólo Excel), como si salieran de los PDFs.
+    La búsqueda por estilo usa los índices (style, color, size); el cruce fino lo hace
+    cruzar_excel_pdf igual que con PDFs.
+    """
+    with closing(_indice_conectar()) as conn:
+        conn.execute("CREATE TEMP TABLE estilos_buscados (style TEXT PRIMARY KEY)")
+        conn.executemany(
+            "INSERT OR IGNORE INTO estilos_buscados VALUES (?)",
+            ((e,) for e in estilos if isinstance(e, str)),
+        )
+        filas = conn.execute(
+            "SELECT i.style, i.color_code, i.color_name, i.size, i.upc, i.style_color"
+            " FROM estilos_buscados e JOIN indice_upc i ON i.style = e.style"
+            " ORDER BY i.style, i.color_code, i.size, i.upc"
+        ).fetchall()
+    registros = RegistrosPDF()
+    for c, valores in zip(COLUMNAS_REGISTRO, zip(*filas)):
+        registros.columnas[c].extend(valores if c == "UPC CODE" else map(sys.intern, valores))
+    return registros
+
+
+def purgar_indice_upc() -> None:
+    """Vacía el índice maestro de UPC (`--purgar-indice`)."""
+    if CACHE_PDF_DB.exists():
+        with closing(_indice_conectar()) as conn:
+            conn.execute("DELETE FROM indice_upc")
+            conn.commit()
+            conn.execute("VACUUM")
+
+# ==========================
+#  PDF: extracción en paralelo (un proceso por archivo)
+# ==========================
+
+def _pdf_workers_default() -> int:
+    """Procesos para extraer PDFs. APP_PDF_WORKERS=1 fuerza el modo secuencial."""
+    env = os.environ.get("APP_PDF_WORKERS", "").strip()
+    if env.isdigit() and int(env) > 0:
+        return int(env)
+    return os.cpu_count() or 1
+
+PDF_WORKERS = _pdf_workers_default()
+
+# APP_FILTRO_ESTILOS=0: extrae todos los estilos del PDF aunque el Excel no los pida
+FILTRO_ESTILOS = os.environ.get("APP_FILTRO_ESTILOS", "1").strip() != "0"
+
+
+def _extraer_pdf_seguro(pdf_path: str, estilos: Optional[frozenset[str]] = None) -> tuple[RegistrosPDF, str]:
+    """Worker: devuelve (registros, error) en vez de propagar la excepción."""
+    try:
+        return extract_data_from_pdf(pdf_path, estilos), ""
+    except Exception as e:
+        return RegistrosPDF(), f"{type(e).__name__}: {e}"
+
+
+def _extraer_sin_cache(pdf_paths: list[str], workers: int, estilos: Optional[frozenset[str]] = None) -> list[tuple[RegistrosPDF, str]]:
+    # Un solo PDF: el paralelismo se hace por páginas (Matricial grande)
+    if len(pdf_paths) == 1 and workers > 1:
+        try:
+            return [(extract_data_from_pdf_por_paginas(pdf_paths[0], workers, estilos), "")]
+        except (BrokenProcessPool, OSError) as e:
+            print(f"Extracción en paralelo no disponible, se sigue en secuencial: {e}")
+        except Exception as e:
+            return [(RegistrosPDF(), f"{type(e).__name__}: {e}")]
+
+    workers = min(workers, len(pdf_paths))
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                return list(ex.map(_extraer_pdf_seguro, pdf_paths, repeat(estilos)))
+        except (BrokenProcessPool, OSError) as e:
+            print(f"Extracción en paralelo no disponible, se sigue en secuencial: {e}")
+    return [_extraer_pdf_seguro(pdf, estilos) for pdf in pdf_paths]
+
+
+def extraer_pdfs(
+    pdf_paths: Iterable[str],
+    max_workers: Optional[int] = None,
+    estilos: Optional[frozenset[str]] = None,
+) -> tuple[RegistrosPDF, list[tuple[str, str]]]:
+    """Extrae los PDFs en un ProcessPoolExecutor y une los registros en el orden de entrada
+    (con un único PDF pendiente se reparten sus páginas). Consulta antes la caché local.
+    Con `estilos` sólo se arman registros de esos estilos (los del Excel).
+    Devuelve (registros, [(pdf, error), ...]).
+    """
+    pdf_paths = list(pdf_paths)
+    workers = max_workers or PDF_WORKERS
+
+    resultados: list[Optional[tuple[RegistrosPDF, str]]] = [None] * len(pdf_paths)
+    hashes: list[Optional[str]] = [None] * len(pdf_paths)
+    pendientes: list[int] = []
+    for i, pdf in enumerate(pdf_paths):
+        try:
+            hashes[i] = hash_archivo(pdf)
+        except OSError:
+            pass
+        rows = cache_get_registros(hashes[i], estilos) if hashes[i] else None
+        if rows is None:
+            pendientes.append(i)
+        else:
+            resultados[i] = (rows, "")
+
+    if pendientes:
+        nuevos = _extraer_sin_cache([pdf_paths[i] for i in pendientes], workers, estilos)
+        for i, (rows, error) in zip(pendientes, nuevos):
+            resultados[i] = (rows, error)
+            if not error and hashes[i]:
+                cache_put_registros(hashes[i], rows, estilos)
+
+    registros = RegistrosPDF()
+    errores: list[tuple[str, str]] = []
+    for pdf, (rows, error) in zip(pdf_paths, resultados):
+        if error:
+            errores.append((pdf, error))
+        else:
+            registros.extend(rows)
+    return registros, errores
+
 # ==========================
 #  EXCEL: preparar datos (solo USA) + columnas extra
 # ==========================
 
+COL_MAP_EXCEL: dict[str, str] = {
+    "STYLE": "NOMBRE ESTILO",
+    "ESTILOS": "NOMBRE ESTILO",
+    "NOMBRE ESTILO": "NOMBRE ESTILO",
+    "OP": "PEDIDO PRODUCCION COFACO",
+    "PEDIDO PRODUCCION COFACO": "PEDIDO PRODUCCION COFACO",
+    "PROTO": "PROTO COFACO",
+    "PROTO COFACO": "PROTO COFACO",
+    "DESTINO": "DESTINO",
+    "PO#": "PO#",
+    "PO": "PO#",
+    "PO NO": "PO#",
+    "PO NO.": "PO#",
+    "DESCRIPCION COLOR": "NOMBRE COLOR",
+    "NOMBRE COLOR": "NOMBRE COLOR",
+    "COLOR": "COLOR",
+    "CARTA": "CARTA",
+    "COLR CODE": "COLOR CODE",
+    "COLOR CODE": "COLOR CODE",
+    "COLUMNA1": "HOJA MARCACION",
+    "HOJA DE MARCACIÓN": "HOJA MARCACION",
+    "HOJA DE MARCACION": "HOJA MARCACION",
+    "TOTAL": "UNITS/TALLA (PEDIDO)",
+    "UNITS/TALLA (PEDIDO)": "UNITS/TALLA (PEDIDO)",
+    "SKX PO#": "SKX PO#",
+    "SKX PO": "SKX PO#",
+    "WIP LINE NUMBER": "WIP LINE NUMBER",
+    "WIP LINE NUMBER:": "WIP LINE NUMBER",
+    "LN": "WIP LINE NUMBER",
+    "CASE QTY": "CASE QTY",
+    "CASEQTY": "CASE QTY",
+}
+_COL_MAP_IDX = {k.upper(): v for k, v in COL_MAP_EXCEL.items()}
+
+# Columnas que usa preparar_excel además de las de COL_MAP_EXCEL y las tallas
+COLUMNAS_EXCEL_EXTRA = {"TT", "UPC BARCODE", "UPC CODE", "UPC", "UPC_BARCODE"}
+
+# APP_EXCEL_STREAMING=0: carga todas las columnas de la hoja detectada (como pd.read_excel)
+EXCEL_STREAMING = os.environ.get("APP_EXCEL_STREAMING", "1").strip() != "0"
+
+
 def _rename_canonical(df: pd.DataFrame) -> pd.DataFrame:
-    col_map_uc = {
-        "STYLE": "NOMBRE ESTILO",
-        "ESTILOS": "NOMBRE ESTILO",
-        "NOMBRE ESTILO": "NOMBRE ESTILO",
-        "OP": "PEDIDO PRODUCCION COFACO",
-        "PEDIDO PRODUCCION COFACO": "PEDIDO PRODUCCION COFACO",
-        "PROTO": "PROTO COFACO",
-        "PROTO COFACO": "PROTO COFACO",
-        "DESTINO": "DESTINO",
-        "PO#": "PO#",
-        "PO": "PO#",
-        "PO NO": "PO#",
-        "PO NO.": "PO#",
-        "DESCRIPCION COLOR": "NOMBRE COLOR",
-        "NOMBRE COLOR": "NOMBRE COLOR",
-        "COLOR": "COLOR",
-        "CARTA": "CARTA",
-        "COLR CODE": "COLOR CODE",
-        "COLOR CODE": "COLOR CODE",
-        "COLUMNA1": "HOJA MARCACION",
-        "HOJA DE MARCACIÓN": "HOJA MARCACION",
-        "HOJA DE MARCACION": "HOJA MARCACION",
-        "TOTAL": "UNITS/TALLA (PEDIDO)",
-        "UNITS/TALLA (PEDIDO)": "UNITS/TALLA (PEDIDO)",
-        "SKX PO#": "SKX PO#",
-        "SKX PO": "SKX PO#",
-        "WIP LINE NUMBER": "WIP LINE NUMBER",
-        "WIP LINE NUMBER:": "WIP LINE NUMBER",
-        "LN": "WIP LINE NUMBER",
-        "CASE QTY": "CASE QTY",
-        "CASEQTY": "CASE QTY",
-    }
-    idx = {k.upper(): v for k, v in col_map_uc.items()}
-    return df.rename(columns={c: idx.get(str(c).strip().upper(), c) for c in df.columns})
+    return df.rename(columns={c: _COL_MAP_IDX.get(str(c).strip().upper(), c) for c in df.columns})
+
+
+def _columna_excel_util(nombre: object) -> bool:
+    """True si preparar_excel usa la columna (alias conocido, extra o talla)."""
+    cu = str(nombre).strip().upper()
+    return cu in _COL_MAP_IDX or cu in COLUMNAS_EXCEL_EXTRA or cu in SIZE_CANONICAL or cu in SIZE_MAP
+
+
+def _columna_texto(valores: list) -> object:
+    """Columna como la deja TextParser(dtype=str): marcadores NA -> NaN, el resto str(v)."""
+    nan = float("nan")
+    return pd.array(
+        [nan if (v.__class__ is str and v in STR_NA_VALUES) or v != v else str(v) for v in valores],
+        dtype="str",
+    )
+
+
+def _valor_celda(cell: object) -> object:
+    """Valor de una celda tal como lo entrega pd.read_excel (engine openpyxl)."""
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return float("nan")
+    if cell.data_type == TYPE_NUMERIC:
+        val = int(cell.value)
+        return val if val == cell.value else float(cell.value)
+    return cell.value
+
+
+def _filas_hoja(ws) -> Iterator[list]:
+    ws.reset_dimensions()
+    for row in ws.rows:
+        fila = [_valor_celda(c) for c in row]
+        while fila and fila[-1] == "":
+            fila.pop()
+        yield fila
+
+
+class HojaExcel:
+    """Hoja de un libro abierto una vez (read_only): cada fila se lee del XML una sola vez,
+    las primeras para detectar el encabezado y el resto sólo si la hoja se usa."""
+
+    def __init__(self, ws) -> None:
+        self.nombre = ws.title
+        self.filas: list[list] = []
+        self._pendientes = _filas_hoja(ws)
+
+    def primeras(self, n: int) -> list[list]:
+        while len(self.filas) < n:
+            fila = next(self._pendientes, None)
+            if fila is None:
+                break
+            self.filas.append(fila)
+        return self.filas[:n]
+
+    def tabla(self, header: Optional[int] = 0, dtype: object = None, nrows: Optional[int] = None) -> pd.DataFrame:
+        """Equivale a pd.read_excel(<libro>, sheet_name=<hoja>, header=, dtype=, nrows=)."""
+        if nrows is None:
+            self.filas.extend(self._pendientes)
+            data = self.filas
+        else:
+            data = self.primeras((1 if header is None else header + 1) + nrows)
+        # Igual que pandas: sin filas vacías al final y todas con el mismo ancho
+        fin = len(data)
+        while fin and not data[fin - 1]:
+            fin -= 1
+        if not fin:
+            return pd.DataFrame()
+        ancho = max(len(f) for f in data[:fin])
+        data = [f + [""] * (ancho - len(f)) for f in data[:fin]]
+        try:
+            return TextParser(data, header=header, dtype=dtype, nrows=nrows, skip_blank_lines=False).read(nrows=nrows)
+        except EmptyDataError:
+            return pd.DataFrame()
+
+    def columnas(self, header: int, usar: Callable[[object], bool]) -> pd.DataFrame:
+        """Como tabla(header=header, dtype=str) pero sólo con las columnas cuyo encabezado cumple `usar`.
+        Recorre las filas en streaming y guarda sólo esas celdas: el pico de memoria depende de lo
+        que se conserva, no del tamaño de la hoja. Sin columnas útiles carga la hoja completa."""
+        filas = self.primeras(header + 1)
+        if len(filas) <= header or not filas[header]:
+            return self.tabla(header=header, dtype=str)
+        # Nombres como los pondría pandas ("Unnamed: i", duplicados con ".1"...)
+        nombres = TextParser([filas[header]], header=0).read().columns
+        posiciones = [i for i, nombre in enumerate(nombres) if usar(nombre)]
+        if not posiciones:
+            return self.tabla(header=header, dtype=str)
+
+        buffers: list[list] = [[] for _ in posiciones]
+        n = fin = 0
+        for fila in chain(self.filas[header + 1:], self._pendientes):
+            n += 1
+            if fila:
+                fin = n
+            ancho = len(fila)
+            for buf, i in zip(buffers, posiciones):
+                buf.append(fila[i] if i < ancho else "")
+
+        datos = {}
+        for k, buf in enumerate(buffers):
+            del buf[fin:]  # igual que pandas: sin filas vacías al final
+            datos[k] = _columna_texto(buf)
+            buf.clear()
+        df = pd.DataFrame(datos, index=pd.RangeIndex(fin))
+        df.columns = nombres[posiciones]
+        return df
 
 
 def _read_excel_flexible(excel_path: str) -> pd.DataFrame:
-    """Intenta leer el Excel detectando hoja y fila de encabezados automáticamente."""
+    """Intenta leer el Excel detectando hoja y fila de encabezados automáticamente.
+    El libro se abre una sola vez: detección, carga y fallbacks usan las mismas filas.
+    De la hoja detectada sólo se cargan las columnas que usa preparar_excel (ver HojaExcel.columnas).
+    """
     def norm_token(value: object) -> str:
         s = str(value).strip().upper()
         s = re.sub(r"[^A-Z0-9#]+", " ", s)
@@ -482,33 +1555,54 @@ def _read_excel_flexible(excel_path: str) -> pd.DataFrame:
         "COLOR CODE",
     }
 
-    best: Optional[tuple[int, str, int]] = None  # (hits, sheet, header_row)
+    best: Optional[tuple[int, HojaExcel, int]] = None  # (hits, hoja, header_row)
+    hojas: list[HojaExcel] = []
+    wb = None
 
     try:
-        xls = pd.ExcelFile(excel_path, engine="openpyxl")
-        for sheet in xls.sheet_names:
-            preview = pd.read_excel(excel_path, engine="openpyxl", sheet_name=sheet, header=None, nrows=30)
+        wb = openpyxl.load_workbook(excel_path, read_only=True, data_only=True, keep_links=False)
+        hojas = [HojaExcel(ws) for ws in wb.worksheets]
+        for hoja in hojas:
+            preview = hoja.tabla(header=None, nrows=30)
             for idx, row in preview.iterrows():
                 cells = [norm_token(c) for c in row.tolist()]
                 hits = {c for c in cells if c in header_terms}
                 if "STYLE" in hits or "ESTILOS" in hits:
                     if best is None or len(hits) > best[0]:
-                        best = (len(hits), sheet, idx)
+                        best = (len(hits), hoja, idx)
     except Exception as e:
         print(f"Error inspeccionando hojas del Excel: {e}")
         best = None
+        hojas = []
+
+    try:
+        return _leer_hoja_detectada(excel_path, best, hojas[0] if hojas else None)
+    finally:
+        if wb is not None:
+            wb.close()
+
+
+def _leer_hoja_detectada(excel_path: str, best: Optional[tuple[int, HojaExcel, int]], hoja0: Optional[HojaExcel]) -> pd.DataFrame:
+    """Carga la hoja detectada o, si no hay, los fallbacks sobre la hoja 0 (sin releer el archivo)."""
+    def leer(header: Optional[int], dtype: object = None, nrows: Optional[int] = None) -> pd.DataFrame:
+        if hoja0 is not None:
+            return hoja0.tabla(header=header, dtype=dtype, nrows=nrows)
+        return pd.read_excel(excel_path, dtype=dtype, engine="openpyxl", sheet_name=0, header=header, nrows=nrows)
 
     if best:
-        _, sheet, header_row = best
-        df = pd.read_excel(excel_path, dtype=str, engine="openpyxl", sheet_name=sheet, header=header_row)
+        _, hoja, header_row = best
+        if EXCEL_STREAMING:
+            df = hoja.columnas(header_row, _columna_excel_util)
+        else:
+            df = hoja.tabla(header=header_row, dtype=str)
         if df is not None and df.shape[1] > 0:
             df.columns = [str(col).strip() if pd.notna(col) else f"Col_{i}" for i, col in enumerate(df.columns)]
-            print(f"Excel detectado: hoja='{sheet}', header={header_row}")
+            print(f"Excel detectado: hoja='{hoja.nombre}', header={header_row}")
             print(f"Columnas finales: {list(df.columns)}")
             return df
 
     # Fallback al comportamiento anterior (hoja 0)
-    df_preview = pd.read_excel(excel_path, engine="openpyxl", sheet_name=0, header=None, nrows=10)
+    df_preview = leer(None, nrows=10)
     best_header_row = 0
     max_text_score = 0
     for i in range(min(5, len(df_preview))):
@@ -524,7 +1618,7 @@ def _read_excel_flexible(excel_path: str) -> pd.DataFrame:
             best_header_row = i
 
     try:
-        df = pd.read_excel(excel_path, dtype=str, engine="openpyxl", sheet_name=0, header=best_header_row)
+        df = leer(best_header_row, dtype=str)
         if df is not None and df.shape[1] > 0:
             df.columns = [str(col).strip() if pd.notna(col) else f"Col_{i}" for i, col in enumerate(df.columns)]
             print(f"Columnas finales: {list(df.columns)}")
@@ -533,7 +1627,7 @@ def _read_excel_flexible(excel_path: str) -> pd.DataFrame:
         print(f"Error leyendo con header={best_header_row}: {e}")
 
     try:
-        df = pd.read_excel(excel_path, dtype=str, engine="openpyxl", sheet_name=0, header=None)
+        df = leer(None, dtype=str)
         df.columns = [f"Col_{i}" for i in range(len(df.columns))]
         print(f"Fallback: usando columnas genéricas {list(df.columns)}")
         return df
@@ -541,6 +1635,54 @@ def _read_excel_flexible(excel_path: str) -> pd.DataFrame:
         raise ValueError("No se pudo leer el archivo Excel. Verifica que sea un archivo válido.")
 
 
+def _tiene_cantidad(v: object) -> bool:
+    """Regla por valor: vacío o número <= 0 no cuenta; un texto no numérico sí."""
+    if v is None:
+        return False
+    s = str(v).strip()
+    if s == "":
+        return False
+    try:
+        return float(s) > 0
+    except Exception:
+        return True
+
+
+def hay_cantidad(qty: pd.Series) -> pd.Series:
+    """Máscara de `_tiene_cantidad` para toda la columna, calculada sobre los valores distintos
+    (to_numeric para los números, la regla en Python sólo para los textos que no lo son) y
+    expandida con los códigos de factorize; vacío/NaN no cuenta."""
+    codigos, unicos = pd.factorize(qty)
+    if not len(unicos):
+        return pd.Series(False, index=qty.index)
+    texto = pd.Series(unicos, dtype=object).str.strip()
+    num = pd.to_numeric(texto, errors="coerce")
+    por_valor = num.gt(0)
+    dudosos = num.isna()
+    if dudosos.any():
+        por_valor[dudosos] = [_tiene_cantidad(v) for v in texto[dudosos]]
+    return pd.Series((codigos >= 0) & por_valor.to_numpy()[codigos], index=qty.index)
+
+
+def texto_normalizado(serie: pd.Series) -> pd.Series:
+    """Igual que serie.astype(str).str.strip().str.upper(), pero una vez por valor distinto."""
+    texto = serie.astype(str)
+    codigos, unicos = pd.factorize(texto)
+    norm = pd.Series(unicos, dtype=texto.dtype).str.strip().str.upper()
+    return pd.Series(norm.array.take(codigos, allow_fill=True), index=serie.index, name=serie.name)
+
+
+def despivotar_tallas(df: pd.DataFrame, id_vars: list[str], size_cols: list[str], var_name: str, value_name: str) -> pd.DataFrame:
+    """Como df.melt(id_vars, size_cols, ...) filtrado con hay_cantidad, sin armar el producto
+    filas x tallas: de cada talla sólo se despivotan las filas con cantidad (casi todas las
+    tallas de una fila vienen vacías). Mismo orden de filas y mismos tipos que el melt completo."""
+    partes = []
+    for c in size_cols:
+        con_qty = hay_cantidad(df[c])
+        partes.append(df.loc[con_qty, id_vars + [c]].melt(id_vars=id_vars, var_name=var_name, value_name=value_name))
+    return pd.concat(partes, ignore_index=True)
+
+
 def preparar_excel(df_excel: pd.DataFrame) -> pd.DataFrame:
     df_excel = _rename_canonical(df_excel)
 
@@ -556,7 +1698,7 @@ def preparar_excel(df_excel: pd.DataFrame) -> pd.DataFrame:
     for _fc in _ffill_cols:
         if _fc in df_excel.columns:
             if _group_col:
-                df_excel[_fc] = df_excel.groupby(_group_col)[_fc].transform(lambda s: s.ffill())
+                df_excel[_fc] = df_excel.groupby(_group_col)[_fc].ffill()
             else:
                 df_excel[_fc] = df_excel[_fc].ffill()
 
@@ -647,7 +1789,7 @@ def preparar_excel(df_excel: pd.DataFrame) -> pd.DataFrame:
         df_excel["PROTO COFACO"] = ""
 
     for c in ["NOMBRE ESTILO", "DESTINO", "NOMBRE COLOR", "COLOR"]:
-        df_excel[c] = df_excel[c].astype(str).str.strip().str.upper()
+        df_excel[c] = texto_normalizado(df_excel[c])
 
     # ¿Tallas como columnas?
     size_cols: list[str] = []
@@ -672,26 +1814,8 @@ def preparar_excel(df_excel: pd.DataFrame) -> pd.DataFrame:
 
     if size_cols:
         canon = {c: SIZE_MAP.get(str(c).strip().upper(), str(c).strip().upper()) for c in size_cols}
-        df_long = df_excel.melt(
-            id_vars=id_vars_base + extras,
-            value_vars=size_cols,
-            var_name="SIZE_RAW",
-            value_name="QTY",
-        )
-        df_long["SIZE"] = df_long["SIZE_RAW"].map(lambda x: canon.get(x, str(x).upper()))
-
-        def has_qty(v: object) -> bool:
-            if v is None:
-                return False
-            s = str(v).strip()
-            if s == "":
-                return False
-            try:
-                return float(s) > 0
-            except Exception:
-                return True
-
-        df_long = df_long[df_long["QTY"].apply(has_qty)].copy()
+        df_long = despivotar_tallas(df_excel, id_vars_base + extras, size_cols, var_name="SIZE_RAW", value_name="QTY")
+        df_long["SIZE"] = df_long["SIZE_RAW"].map(canon)
         df_long.rename(columns={"QTY": "QTY POR TALLA"}, inplace=True)
         return df_long.reset_index(drop=True)
 
@@ -700,10 +1824,411 @@ def preparar_excel(df_excel: pd.DataFrame) -> pd.DataFrame:
     out["QTY POR TALLA"] = ""
     return out
 
+# ==========================
+#  EXCEL: caché del Excel preparado (misma base SQLite)
+# ==========================
+
+# Subir al cambiar _read_excel_flexible o preparar_excel
+EXCEL_VERSION = "1"
+CACHE_EXCEL_VERSION = f"{EXCEL_VERSION}+pandas={pd.__version__}"
+
+
+def _codificar_excel(df: pd.DataFrame) -> Optional[dict]:
+    """Columnas del Excel preparado como (dtype, valores distintos, códigos); NaN -> null.
+    None si algo no se puede reconstruir igual (celdas que no son texto, índice no 0..n-1).
+    """
+    if not df.index.equals(pd.RangeIndex(len(df))):
+        return None
+    columnas: list = []
+    for k, c in enumerate(df.columns):
+        if not isinstance(c, str):
+            return None
+        indice: dict[Optional[str], int] = {}
+        codigos: list[int] = []
+        serie = df.iloc[:, k]
+        for v in serie.tolist():
+            if v.__class__ is not str:
+                if not (isinstance(v, float) and v != v):
+                    return None
+                v = None
+            codigos.append(indice.setdefault(v, len(indice)))
+        columnas.append([c, str(serie.dtype), list(indice), codigos])
+    return {"filas": len(df), "columnas": columnas}
+
+
+def _decodificar_excel(datos: dict) -> pd.DataFrame:
+    nan = float("nan")
+    columnas = {}
+    for k, (_, dtype, valores, codigos) in enumerate(datos["columnas"]):
+        valores = [nan if v is None else sys.intern(v) for v in valores]
+        columnas[k] = pd.Series([valores[i] for i in codigos], dtype=dtype)
+    df = pd.DataFrame(columnas, index=pd.RangeIndex(datos["filas"]))
+    df.columns = [c for c, *_ in datos["columnas"]]  # puede haber nombres repetidos
+    return df
+
+
+def cache_get_excel(hash_excel: str) -> Optional[pd.DataFrame]:
+    """Excel ya preparado para ese contenido + CACHE_EXCEL_VERSION, o None."""
+    if CACHE_MAX_BYTES <= 0:
+        return None
+    try:
+        with closing(_cache_conectar()) as conn, conn:
+            fila = conn.execute(
+                "SELECT datos FROM excel_preparado WHERE hash = ? AND version = ?",
+                (hash_excel, CACHE_EXCEL_VERSION),
+            ).fetchone()
+            if fila is None:
+                return None
+            conn.execute(
+                "UPDATE excel_preparado SET ultimo_uso = ? WHERE hash = ? AND version = ?",
+                (time.time(), hash_excel, CACHE_EXCEL_VERSION),
+            )
+        return _decodificar_excel(json.loads(zlib.decompress(fila[0])))
+    except Exception as e:
+        print(f"Caché Excel no disponible: {e}")
+        return None
+
+
+def cache_put_excel(hash_excel: str, df: pd.DataFrame) -> None:
+    if CACHE_MAX_BYTES <= 0:
+        return
+    try:
+        columnas = _codificar_excel(df)
+        if columnas is None:
+            return
+        datos = zlib.compress(json.dumps(columnas, separators=(",", ":")).encode("utf-8"))
+        with closing(_cache_conectar()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO excel_preparado VALUES (?, ?, ?, ?, ?)",
+                (hash_excel, CACHE_EXCEL_VERSION, datos, len(datos), time.time()),
+            )
+            _cache_recortar(conn)
+    except Exception as e:
+        print(f"No se pudo guardar en la caché Excel: {e}")
+
+
+def cargar_excel_preparado(excel_path: str) -> pd.DataFrame:
+    """_read_excel_flexible + preparar_excel, o el resultado guardado para ese mismo contenido.
+    La hoja y la fila de encabezado salen del contenido, así que basta con su hash.
+    """
+    h: Optional[str] = None
+    try:
+        h = hash_archivo(excel_path)
+    except OSError:
+        pass
+    if h:
+        df = cache_get_excel(h)
+        if df is not None:
+            print(f"Excel preparado desde la caché: {Path(excel_path).name}")
+            return df
+    df = preparar_excel(_read_excel_flexible(excel_path))
+    if h:
+        cache_put_excel(h, df)
+    return df
+
+# ==========================
+#  Cruce Excel / PDF: claves categóricas y emparejado
+# ==========================
+
+# Columnas del cruce Excel / PDF; las de un mismo grupo comparten categorías
+CLAVES_CRUCE = (
+    ("NOMBRE ESTILO", "STYLE"),
+    ("NOMBRE COLOR", "COLOR NAME"),
+    ("COLOR", "COLOR CODE"),
+    ("SIZE",),
+    ("DESTINO",),
+)
+
+# Reglas del cruce en orden de prioridad: (nombre, claves Excel, claves PDF); SIZE se suma si el Excel la trae
+REGLAS_CRUCE = (
+    ("NOMBRE COLOR", ("NOMBRE ESTILO", "NOMBRE COLOR"), ("STYLE", "COLOR NAME")),
+    ("CODIGO COLOR", ("NOMBRE ESTILO", "COLOR"), ("STYLE", "COLOR CODE")),
+)
+# Una fila del resultado por cada (fila Excel con estas claves, UPC + talla del PDF)
+CLAVES_UNICAS_EXCEL = ("NOMBRE ESTILO", "NOMBRE COLOR", "COLOR", "DESTINO", "PO#", "SIZE")
+CLAVES_UNICAS_PDF = ("UPC CODE", "SIZE")
+
+# Cruce aproximado de NOMBRE COLOR (opcional) para filas sin cruce exacto
+REGLA_COLOR_APROX = "NOMBRE COLOR APROX"
+UMBRAL_COLOR_APROX = 0.9  # similitud desde la que se aplica sola; por debajo va a revisión
+HOJA_REVISION_COLORES = "REVISION COLORES"
+
+
+def _clave_texto(v: Optional[str]) -> Optional[str]:
+    return v if v != v else str(v).strip().upper()
+
+
+def claves_categoricas(df_excel: pd.DataFrame, df_pdfs: pd.DataFrame) -> None:
+    """Normaliza una sola vez las claves del cruce de ambos lados (strip + upper; norm_size en
+    SIZE), por valor distinto y no por celda, y las deja como categóricas con las mismas
+    categorías en cada grupo de CLAVES_CRUCE. Las categorías van ordenadas como texto: merges,
+    sort_values y groupby trabajan sobre códigos enteros y dan el mismo orden que con str.
+    """
+    for grupo in CLAVES_CRUCE:
+        normalizar = norm_size if grupo == ("SIZE",) else _clave_texto
+        lados = []
+        for c in grupo:
+            for df in (df_excel, df_pdfs):
+                if c in df.columns:
+                    codigos, unicos = pd.factorize(df[c], use_na_sentinel=False)
+                    lados.append((df, c, codigos, [normalizar(v) for v in unicos]))
+        dtype = pd.CategoricalDtype(sorted({v for *_, norm in lados for v in norm if v == v}))
+        for df, c, codigos, norm in lados:
+            # NaN (no está entre las categorías) queda con código -1
+            df[c] = pd.Categorical.from_codes(dtype.categories.get_indexer(norm).take(codigos), dtype=dtype)
+
+
+def _clave_entera(df: pd.DataFrame, columnas: Iterable[str]) -> np.ndarray:
+    """Códigos de columnas categóricas combinados en un entero por fila. NaN (código -1)
+    también cruza con NaN, como en pd.merge.
+    """
+    clave = np.zeros(len(df), dtype=np.int64)
+    for c in columnas:
+        col = df[c]
+        clave = clave * (len(col.cat.categories) + 1) + (col.cat.codes.to_numpy(dtype=np.int64) + 1)
+    return clave
+
+
+def _texto_color(nombre: str) -> str:
+    """NOMBRE COLOR comparable: sólo letras y dígitos ("WHITE/GREY" = "WHITE GREY" = "WHITEGREY")."""
+    return "".join(re.findall(r"[A-Z0-9]+", str(nombre).upper()))
+
+
+def _trigramas(texto: str) -> set[str]:
+    t = f" {texto} "
+    return {t[k:k + 3] for k in range(len(t) - 2)}
+
+
+def _colores_aproximados(
+    df_excel: pd.DataFrame, df_pdfs: pd.DataFrame, filas: np.ndarray, talla: tuple[str, ...]
+) -> tuple[np.ndarray, pd.DataFrame]:
+    """Cruce aproximado de NOMBRE COLOR para las `filas` del Excel sin cruce exacto.
+    Cada bloque (estilo[, talla]) de los PDFs tiene un índice trigrama -> COLOR NAME: sólo se
+    puntúan (SequenceMatcher) los colores del mismo bloque que comparten algún trigrama, y una
+    vez por (estilo, talla, color) distinto, no por fila. Devuelve por fila el código del
+    COLOR NAME aplicado (-1 si ninguno) y la tabla de la hoja de revisión.
+    """
+    nombres = df_excel["NOMBRE COLOR"].cat.categories
+    col_excel = ["NOMBRE ESTILO", *talla, "NOMBRE COLOR"]
+    col_pdf = ["STYLE", *talla, "COLOR NAME"]
+
+    bloques: dict[tuple[int, ...], dict[str, set[int]]] = {}
+    textos: dict[int, str] = {}
+    trios_pdf = np.unique(np.column_stack([df_pdfs[c].cat.codes.to_numpy() for c in col_pdf]), axis=0)
+    for *bloque, nombre in trios_pdf.tolist():
+        if nombre < 0:
+            continue
+        textos[nombre] = _texto_color(nombres[nombre])
+        indice = bloques.setdefault(tuple(bloque), {})
+        for g in _trigramas(textos[nombre]):
+            indice.setdefault(g, set()).add(nombre)
+
+    trios, inversa = np.unique(
+        np.column_stack([df_excel[c].cat.codes.to_numpy()[filas] for c in col_excel]).reshape(len(filas), len(col_excel)),
+        axis=0, return_inverse=True,
+    )
+    inversa = inversa.reshape(-1)
+    n_filas = np.bincount(inversa, minlength=len(trios))
+    aplicado = np.full(len(trios), -1, dtype=np.int64)
+    revision: list[tuple] = []
+    for k, (*bloque, nombre) in enumerate(trios.tolist()):
+        indice = bloques.get(tuple(bloque))
+        if indice is None or nombre < 0:
+            continue  # estilo / talla que no está en los PDFs: no es un casi-cruce
+        texto = _texto_color(nombres[nombre])
+        candidatos = set().union(*(indice.get(g, ()) for g in _trigramas(texto)))
+        puntajes = sorted(
+            ((difflib.SequenceMatcher(None, texto, textos[c], autojunk=False).ratio(), c) for c in candidatos),
+            key=lambda p: (-p[0], textos[p[1]]),
+        )
+        if not puntajes:
+            continue  # ningún color del bloque se le parece
+        similitud, sugerido = puntajes[0]
+        if similitud >= UMBRAL_COLOR_APROX and (len(puntajes) < 2 or puntajes[1][0] < similitud):
+            aplicado[k] = sugerido
+        revision.append((
+            *(df_excel[c].cat.categories[v] if v >= 0 else "" for c, v in zip(col_excel, bloque)),
+            nombres[nombre],
+            nombres[sugerido],
+            round(similitud, 2),
+            int(n_filas[k]),
+            "APLICADO" if aplicado[k] >= 0 else "REVISAR",
+        ))
+    df_revision = pd.DataFrame(
+        revision,
+        columns=[*col_excel[:-1], "NOMBRE COLOR (EXCEL)", "COLOR NAME (PDF)", "SIMILITUD", "FILAS EXCEL", "ESTADO"],
+    )
+    return aplicado[inversa], df_revision
+
+
+def cruzar_excel_pdf(
+    df_excel: pd.DataFrame, df_pdfs: pd.DataFrame, difuso: bool = False
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Cruce Excel / PDF en una sola pasada, con las claves ya en claves_categoricas.
+    Un índice ordenado sobre los registros PDF, con una entrada por regla de REGLAS_CRUCE;
+    cada fila del Excel se busca una vez por regla y, ante repetidos en CLAVES_UNICAS_EXCEL +
+    CLAVES_UNICAS_PDF, queda la regla de más prioridad (la columna "REGLA CRUCE" dice cuál).
+    Mismas columnas y claves que los dos pd.merge + concat + drop_duplicates de antes, en orden
+    de regla, fila del Excel y registro PDF (el merge de varias claves no garantiza orden).
+    Con `difuso`, las filas sin cruce exacto prueban además _colores_aproximados (regla
+    REGLA_COLOR_APROX). Devuelve (cruce, revisión de colores aproximados; vacía sin `difuso`).
+    """
+    con_talla = "SIZE" in df_excel.columns
+    talla = ("SIZE",) if con_talla else ()
+    n_reglas, n_pdf = len(REGLAS_CRUCE), len(df_pdfs)
+
+    indice_pdf = np.concatenate([_clave_entera(df_pdfs, der + talla) * n_reglas + r
+                                 for r, (_, _, der) in enumerate(REGLAS_CRUCE)])
+    orden = np.argsort(indice_pdf, kind="stable")  # a igual clave, en el orden del PDF
+    indice_pdf = indice_pdf[orden]
+
+    filas_excel, filas_pdf, reglas = [], [], []
+
+    def buscar(buscada: np.ndarray, filas: np.ndarray, regla: int) -> None:
+        desde = np.searchsorted(indice_pdf, buscada, side="left")
+        n = np.searchsorted(indice_pdf, buscada, side="right") - desde
+        filas_excel.append(np.repeat(filas, n))
+        filas_pdf.append(orden[np.repeat(desde - np.cumsum(n) + n, n) + np.arange(n.sum())] % max(n_pdf, 1))
+        reglas.append(np.full(n.sum(), regla, dtype=np.int8))
+
+    for r, (_, izq, _) in enumerate(REGLAS_CRUCE):
+        buscar(_clave_entera(df_excel, izq + talla) * n_reglas + r, np.arange(len(df_excel)), r)
+
+    df_revision = pd.DataFrame()
+    if difuso:
+        sin_cruce = np.ones(len(df_excel), dtype=bool)
+        for filas in filas_excel:
+            sin_cruce[filas] = False
+        filas = np.flatnonzero(sin_cruce)
+        color_aprox, df_revision = _colores_aproximados(df_excel, df_pdfs, filas, talla)
+        filas, color_aprox = filas[color_aprox >= 0], color_aprox[color_aprox >= 0]
+        # Mismo índice que la regla por nombre, con el COLOR NAME aproximado en lugar del del Excel
+        aprox = df_excel.iloc[filas].assign(**{
+            "NOMBRE COLOR": pd.Categorical.from_codes(color_aprox, dtype=df_excel["NOMBRE COLOR"].dtype)
+        })
+        buscar(_clave_entera(aprox, REGLAS_CRUCE[0][1] + talla) * n_reglas, filas, n_reglas)
+
+    # Primero todo lo que cruza por la primera regla: ante repetidos queda esa
+    fila_excel, fila_pdf, regla = (np.concatenate(v) for v in (filas_excel, filas_pdf, reglas))
+
+    grupo_excel = df_excel.groupby([c for c in CLAVES_UNICAS_EXCEL if c in df_excel.columns],
+                                   dropna=False, sort=False).ngroup().to_numpy()
+    grupo_pdf = df_pdfs.groupby(list(CLAVES_UNICAS_PDF), dropna=False, sort=False).ngroup().to_numpy()
+    unicas = ~pd.Index(grupo_excel[fila_excel] * (n_pdf + 1) + grupo_pdf[fila_pdf]).duplicated()
+    fila_excel, fila_pdf, regla = fila_excel[unicas], fila_pdf[unicas], regla[unicas]
+
+    izq = df_excel.take(fila_excel).reset_index(drop=True)
+    der = df_pdfs.drop(columns=list(talla)).take(fila_pdf).reset_index(drop=True)
+    comunes = izq.columns.intersection(der.columns)
+    izq = izq.rename(columns={c: f"{c}_x" for c in comunes})
+    der = der.rename(columns={c: f"{c}_y" for c in comunes})
+    df = pd.concat([izq, der], axis=1)
+    df["REGLA CRUCE"] = pd.Categorical.from_codes(
+        regla, categories=[nombre for nombre, *_ in REGLAS_CRUCE] + [REGLA_COLOR_APROX]
+    )
+    return df, df_revision
+
+
+def resumen_cruce(df: pd.DataFrame) -> str:
+    conteo = df["REGLA CRUCE"].value_counts(sort=False)
+    return ", ".join(f"{n} por {regla.lower()}" for regla, n in conteo.items() if n or regla != REGLA_COLOR_APROX)
+
+
+def escribir_hoja_revision(wb, titulo: str, df_revision: pd.DataFrame) -> None:
+    """Hoja aparte para revisar a mano (colores aproximados, UPC marcados).
+    Anchos y paneles van antes de las filas: sirve también en libros write_only.
+    """
+    ws = wb.create_sheet(titulo)
+    for k, columna in enumerate(df_revision.columns, start=1):
+        ancho = max([len(str(columna))] + [len(str(v)) for v in df_revision[columna]])
+        ws.column_dimensions[get_column_letter(k)].width = min(ancho + 2, 60)
+    ws.freeze_panes = "A2"
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(df_revision.columns))}{len(df_revision) + 1}"
+    negrita = Font(bold=True)
+    encabezado = []
+    for columna in df_revision.columns:
+        cell = WriteOnlyCell(ws, value=columna)
+        cell.font = negrita
+        encabezado.append(cell)
+    ws.append(encabezado)
+    for fila in df_revision.itertuples(index=False, name=None):
+        ws.append(list(fila))
+
+# ==========================
+#  UPC: normalización y dígito verificador
+# ==========================
+
+# Largo de cada formato GTIN; Japón usa EAN-13 (el UPC-A con un '0' delante)
+FORMATOS_GTIN = {"UPC-A": 12, "EAN-13": 13, "GTIN-14": 14}
+ESTADOS_UPC = ("OK", "DIGITO VERIFICADOR", "LONGITUD", "VACIO")
+HOJA_REVISION_UPC = "REVISION UPC"
+COLUMNAS_REVISION_UPC = ["NOMBRE ESTILO", "NOMBRE COLOR", "SIZE", "UPC CODE", "UPC ESTADO"]
+
+
+def normalizar_upcs(upcs: pd.Series, formato: str = "UPC-A") -> tuple[pd.Series, pd.Series]:
+    """(UPC, estado): sólo dígitos y al largo de `formato` (se repone el cero
+    inicial perdido, un dígito de menos; los sobrantes sólo se quitan si son
+    ceros; si faltan más queda en LONGITUD), con el dígito verificador validado
+    en bloque. Se trabaja sobre los valores distintos, sin regex por fila.
+    """
+    largo = FORMATOS_GTIN[formato]
+    codigos, unicos = pd.factorize(upcs, use_na_sentinel=False)
+    digitos = pd.Series(unicos, dtype=object).fillna("").astype(str)
+    # isdecimal también acepta dígitos Unicode (p. ej. "٣"): ésos van por la regex
+    sucios = ~(digitos.str.isdecimal() & digitos.str.isascii())
+    if sucios.any():
+        digitos[sucios] = digitos[sucios].str.replace(r"[^0-9]", "", regex=True)
+    n = digitos.str.len().to_numpy()
+    ajustados = digitos.copy()
+    largos = n > largo
+    if largos.any():
+        # Se quita sólo el exceso, y sólo si es de ceros (p. ej. un UPC-A dentro de un GTIN-14)
+        sobrantes = digitos[largos]
+        recortables = sobrantes.index[sobrantes.str[:-largo].str.lstrip("0") == ""]
+        ajustados[recortables] = digitos[recortables].str[-largo:]
+    sin_cero = ajustados.str.len().to_numpy() == largo - 1
+    if sin_cero.any():
+        ajustados[sin_cero] = ajustados[sin_cero].str.zfill(largo)
+    en_formato = (n > 0) & (ajustados.str.len().to_numpy() == largo)
+
+    valido = np.zeros(len(unicos), dtype=bool)
+    if en_formato.any():
+        bytes_upc = np.array(ajustados[en_formato].tolist(), dtype=f"S{largo}")
+        # Pesos 3-1-3... desde la derecha; con el verificador la suma es múltiplo de 10
+        d = bytes_upc.view(np.uint8).reshape(-1, largo) - ord("0")
+        pesos = np.resize([3, 1], largo - 1)[::-1]
+        valido[en_formato] = (d[:, :-1] @ pesos + d[:, -1]) % 10 == 0
+
+    estado = np.select([n == 0, ~en_formato, ~valido], [3, 2, 1], 0)
+    valores = np.where(en_formato, ajustados, digitos)
+    return (
+        pd.Series(valores.take(codigos), index=upcs.index, name=upcs.name),
+        pd.Series(pd.Categorical.from_codes(estado.take(codigos), categories=ESTADOS_UPC), index=upcs.index),
+    )
+
+
+def resumen_upcs(estado: pd.Series) -> str:
+    conteo = estado.value_counts(sort=False)
+    return ", ".join(f"{n} {e.lower()}" for e, n in conteo.items() if n or e == "OK")
+
+
+def upcs_a_revisar(df: pd.DataFrame) -> pd.DataFrame:
+    """Un renglón por UPC marcado (estilo, color, talla) para la hoja de revisión."""
+    marcados = df.loc[df["UPC ESTADO"] != "OK", COLUMNAS_REVISION_UPC].drop_duplicates()
+    return marcados.sort_values(["NOMBRE ESTILO", "UPC CODE"])
+
 # ==========================
 #  EXCEL: escritura y fórmulas
 # ==========================
 
+# Estilos compartidos por todas las celdas de la tabla (uno por variante, no uno por celda).
+# La hoja es copia de la plantilla: se asignan por atributo para no pisar bordes ni formatos suyos
+FUENTE_ENCABEZADO = Font(bold=True, color="000000")  # Negro y negrita
+RELLENO_ENCABEZADO = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")  # Fondo amarillo
+ALINEACION_ENCABEZADO = Alignment(horizontal="center", vertical="center", wrap_text=True)
+ALINEACION_DATO = Alignment(horizontal="center", vertical="center")
+FUENTE_DATO = Font(bold=False)
+
 def apply_formulas_to_sheet(ws: openpyxl.worksheet.worksheet.Worksheet, header_row: int, max_col: int, last_data_row: int) -> None:
     """Aplica fórmulas y agrega notas. Mantiene encabezados del template y aplica formato.
     - header_row: fila con encabezados (p. ej. 10)
@@ -730,7 +2255,7 @@ def apply_formulas_to_sheet(ws: openpyxl.worksheet.worksheet.Worksheet, header_r
             cell = ws.cell(row=r, column=col_result)
             cell.value = formula
             cell.number_format = "0"
-            cell.alignment = Alignment(horizontal="center", vertical="center")
+            cell.alignment = ALINEACION_DATO
 
     # Forzar formato de texto para códigos
     if "UPC Barcode" in headers:
@@ -756,9 +2281,9 @@ def apply_formulas_to_sheet(ws: openpyxl.worksheet.worksheet.Worksheet, header_r
     for c in range(1, max_col + 1):
         header_cell = ws.cell(row=header_row, column=c)
         if header_cell.value:
-            header_cell.font = Font(bold=True, color="000000")  # Negro y negrita
-            header_cell.fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")  # Fondo amarillo
-            header_cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)  # AGREGAR AJUSTAR TEXTO
+            header_cell.font = FUENTE_ENCABEZADO
+            header_cell.fill = RELLENO_ENCABEZADO
+            header_cell.alignment = ALINEACION_ENCABEZADO
 
     # QUITAR LÍNEAS DE CUADRÍCULA DE LA HOJA
     ws.sheet_view.showGridLines = False
@@ -815,7 +2340,7 @@ def copy_template_header_to_worksheet(template_ws, target_ws, img_path: str):
             return
 
         from openpyxl.drawing.image import Image as OpenpyxlImage
-        img = OpenpyxlImage(img_path)
+        imagen = imagen_incrustable(img_path)
 
         # Leer referencia de la imagen de la plantilla (si existe)
         template_images = getattr(template_ws, "_images", [])
@@ -827,16 +2352,20 @@ def copy_template_header_to_worksheet(template_ws, target_ws, img_path: str):
             if hasattr(timg, "width") and hasattr(timg, "height"):
                 t_w, t_h = timg.width, timg.height
 
-        # Ajustar tamaño y ancla del nuevo gráfico
+        # Tamaño en pantalla: el de la plantilla, o el propio limitado a 200 px de ancho
         if t_w and t_h:
-            img.width = t_w
-            img.height = t_h
+            ancho, alto = t_w, t_h
         else:
-            if hasattr(img, "width") and img.width and img.width > 200:
-                ratio = 200 / img.width
-                img.width = 200
-                if hasattr(img, "height") and img.height:
-                    img.height = int(img.height * ratio)
+            ancho, alto = imagen.tamano
+            if ancho > 200:
+                alto = int(alto * 200 / ancho)
+                ancho = 200
+
+        # Bytes reducidos a ese tamaño, compartidos por todas las hojas
+        # (openpyxl cierra el buffer al guardar: uno por hoja)
+        img = OpenpyxlImage(BytesIO(imagen.bytes_para(ancho, alto)))
+        img.width = ancho
+        img.height = alto
         img.anchor = anchor
 
         # Reemplazar imágenes existentes en destino
@@ -886,7 +2415,7 @@ class App:
     # ---------------------- UI ----------------------
     def _build_ui(self) -> None:
         self.root.title("Generador de Reporte Final")
-        self.root.geometry("440x280")
+        self.root.geometry("440x310")
 
         lbl_title = tk.Label(self.root, text="Generador de Reporte Final", font=("Segoe UI", 12, "bold"))
         lbl_title.pack(pady=8)
@@ -900,6 +2429,13 @@ class App:
 
         ttk.Button(frm_imgs, text="Cargar/Cambiar imagen…", command=self.cambiar_imagen, width=26).grid(row=1, column=0, pady=6)
 
+        self.difuso_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.root,
+            text="Cruce aproximado de colores (hoja REVISION COLORES)",
+            variable=self.difuso_var,
+        ).pack(pady=(8, 0))
+
         ttk.Button(
             self.root,
             text="Procesar (seleccionar PDF y Excel)…",
@@ -931,19 +2467,23 @@ class App:
 
     def process_all(self) -> None:
         pdf_paths = filedialog.askopenfilenames(title="Selecciona PDF(s)", filetypes=[("PDF", "*.pdf")])
-        if not pdf_paths:
+        if not pdf_paths and not (INDICE_UPC and messagebox.askyesno(
+            "Sin PDFs",
+            "No se eligieron PDFs.\n¿Resolver los UPC sólo desde el índice local (PDFs ya procesados)?",
+        )):
             return
 
         excel_path = filedialog.askopenfilename(title="Selecciona el Excel (datos)", filetypes=[("Excel", "*.xlsx;*.xls;*.xlsm")])
         if not excel_path:
             return
 
+        difuso = self.difuso_var.get()
         proc = ProcessingWindow(self.root)
 
         def worker() -> None:
             try:
                 proc.update_status("Ubicando recursos…")
-                extra_dirs = [Path(pdf_paths[0]).parent, Path(excel_path).parent]
+                extra_dirs = [Path(pdf).parent for pdf in pdf_paths[:1]] + [Path(excel_path).parent]
                 if not self.state.img1_path or not os.path.exists(self.state.img1_path):
                     self.state.img1_path = locate_asset("imagen 1", [".png", ".jpg", ".jpeg", ".bmp"], extra_dirs)
                 if not self.state.template_excel_path or not os.path.exists(self.state.template_excel_path):
@@ -959,72 +2499,47 @@ class App:
                 # Actualizar preview en el hilo principal
                 self.root.after(0, lambda: mostrar_preview(self.state.img1_path, self.lbl_img1))
 
-                proc.update_status("Extrayendo datos de PDFs…")
-                all_registros: list[dict[str, str]] = []
-                for pdf in pdf_paths:
-                    all_registros.extend(extract_data_from_pdf(pdf))
-
-                if not all_registros:
-                    raise RuntimeError("No se extrajo información de los PDFs.")
-
-                df_pdfs = pd.DataFrame(all_registros)
-                for c in ["STYLE", "COLOR CODE", "COLOR NAME", "SIZE"]:
-                    if c in df_pdfs:
-                        df_pdfs[c] = df_pdfs[c].astype(str).str.strip().str.upper()
-                if "SIZE" in df_pdfs:
-                    df_pdfs["SIZE"] = df_pdfs["SIZE"].map(norm_size)
-
+                # Excel primero: sus estilos (DESTINO=USA) filtran la extracción de PDFs
                 proc.update_status("Procesando Excel de datos…")
-                df_excel_raw = _read_excel_flexible(excel_path)
-                df_excel = preparar_excel(df_excel_raw)
-                for c in ["NOMBRE ESTILO", "DESTINO", "NOMBRE COLOR", "COLOR", "SIZE"]:
-                    if c in df_excel:
-                        df_excel[c] = df_excel[c].astype(str).str.strip().str.upper()
-                if "SIZE" in df_excel.columns:
-                    df_excel["SIZE"] = df_excel["SIZE"].map(norm_size)
-
-                # Filtrar solo filas con DESTINO = USA antes del merge con PDFs
+                df_excel = cargar_excel_preparado(excel_path)
+
+                # Filtrar solo filas con DESTINO = USA antes del cruce con PDFs
                 if "DESTINO" in df_excel.columns:
                     df_excel = df_excel[df_excel["DESTINO"] == "USA"].copy()
                     if df_excel.empty:
                         raise RuntimeError("No se encontraron filas con DESTINO = USA en el Excel.")
 
-                # Merge por nombre/código de color
-                if "SIZE" in df_excel.columns:
-                    df_name = pd.merge(
-                        df_excel,
-                        df_pdfs,
-                        left_on=["NOMBRE ESTILO", "NOMBRE COLOR", "SIZE"],
-                        right_on=["STYLE", "COLOR NAME", "SIZE"],
-                        how="inner",
-                    )
-                    df_code = pd.merge(
-                        df_excel,
-                        df_pdfs,
-                        left_on=["NOMBRE ESTILO", "COLOR", "SIZE"],
-                        right_on=["STYLE", "COLOR CODE", "SIZE"],
-                        how="inner",
-                    )
+                if pdf_paths:
+                    proc.update_status("Extrayendo datos de PDFs…")
+                    estilos = frozenset(df_excel["NOMBRE ESTILO"]) if FILTRO_ESTILOS else None
+                    all_registros, errores_pdf = extraer_pdfs(pdf_paths, estilos=estilos)
                 else:
-                    df_name = pd.merge(
-                        df_excel,
-                        df_pdfs,
-                        left_on=["NOMBRE ESTILO", "NOMBRE COLOR"],
-                        right_on=["STYLE", "COLOR NAME"],
-                        how="inner",
-                    )
-                    df_code = pd.merge(
-                        df_excel,
-                        df_pdfs,
-                        left_on=["NOMBRE ESTILO", "COLOR"],
-                        right_on=["STYLE", "COLOR CODE"],
-                        how="inner",
-                    )
+                    proc.update_status("Buscando UPCs en el índice local…")
+                    estilos = frozenset(df_excel["NOMBRE ESTILO"])
+                    all_registros, errores_pdf = indice_upc_registros(estilos), []
+                if errores_pdf:
+                    detalle = "\n".join(f"- {Path(pdf).name}: {err}" for pdf, err in errores_pdf)
+                    print(f"PDFs con errores (omitidos):\n{detalle}")
+                    self.root.after(0, lambda: messagebox.showwarning(
+                        "PDFs con errores",
+                        f"No se pudieron leer algunos PDFs (se omiten):\n{detalle}",
+                    ))
 
-                subset_cols = [c for c in [
-                    "NOMBRE ESTILO", "NOMBRE COLOR", "COLOR", "DESTINO", "PO#", "SIZE", "UPC CODE"
-                ] if c in (df_name.columns.union(df_code.columns))]
-                df_merge_all = pd.concat([df_name, df_code], ignore_index=True).drop_duplicates(subset=subset_cols)
+                if not all_registros:
+                    if not pdf_paths:
+                        raise RuntimeError("El índice local no tiene UPCs para los estilos del Excel (DESTINO=USA).")
+                    if estilos is not None:
+                        raise RuntimeError("No se extrajo información de los PDFs para los estilos del Excel (DESTINO=USA).")
+                    raise RuntimeError("No se extrajo información de los PDFs.")
+
+                df_pdfs = all_registros.to_dataframe()
+                claves_categoricas(df_excel, df_pdfs)
+                if pdf_paths:
+                    indice_upc_guardar(df_pdfs)
+
+                # Cruce por nombre/código de color (una pasada, sin repetidos)
+                df_merge_all, df_revision = cruzar_excel_pdf(df_excel, df_pdfs, difuso=difuso)
+                print(f"Cruce Excel/PDF: {resumen_cruce(df_merge_all)}")
                 # DEBUG: información para diagnosticar campos vacíos
                 try:
                     print("DEBUG: columnas df_excel:", list(df_excel.columns))
@@ -1060,6 +2575,13 @@ class App:
                 if df_merge_all.empty:
                     raise RuntimeError("No hubo intersección entre PDFs y Excel (DESTINO=USA).")
 
+                # UPC-A sólo dígitos, con el dígito verificador validado (UPC ESTADO)
+                df_upcs_revision = pd.DataFrame()
+                if "UPC CODE" in df_merge_all.columns:
+                    df_merge_all["UPC CODE"], df_merge_all["UPC ESTADO"] = normalizar_upcs(df_merge_all["UPC CODE"])
+                    print(f"UPC: {resumen_upcs(df_merge_all['UPC ESTADO'])}")
+                    df_upcs_revision = upcs_a_revisar(df_merge_all)
+
                 # Aliases, columnas y reglas
                 df_merge_all["PROTO"] = df_merge_all.get("PROTO COFACO", "")
                 df_merge_all["OP"] = df_merge_all.get("PEDIDO PRODUCCION COFACO", "")
@@ -1125,7 +2647,7 @@ class App:
 
                 proc.update_status("Generando archivo final…")
 
-                output_dir = Path(pdf_paths[0]).parent
+                output_dir = Path(pdf_paths[0] if pdf_paths else excel_path).parent
                 template_ext = Path(self.state.template_excel_path).suffix.lower()
                 out_name = "reporte_final_case_content" + (".xlsm" if template_ext == ".xlsm" else ".xlsx")
                 final_filename = str(output_dir / out_name)
@@ -1143,7 +2665,7 @@ class App:
                 template_sheet = wb.worksheets[0]
                 first_style = True
 
-                for style_name, df_style in df_final.groupby("NOMBRE ESTILO"):
+                for style_name, df_style in df_final.groupby("NOMBRE ESTILO", observed=True):
                     ws = template_sheet if first_style else wb.copy_worksheet(template_sheet)
                     first_style = False
                     # Título hoja máx 31 chars
@@ -1159,9 +2681,9 @@ class App:
                     for col_idx, col_name in enumerate(columnas_final, 1):
                         cell = ws.cell(row=data_start_row, column=col_idx)
                         cell.value = col_name
-                        cell.font = Font(bold=True, color="000000")  # Negro y negrita
-                        cell.fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")  # Fondo amarillo
-                        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)  # AGREGAR AJUSTAR TEXTO
+                        cell.font = FUENTE_ENCABEZADO
+                        cell.fill = RELLENO_ENCABEZADO
+                        cell.alignment = ALINEACION_ENCABEZADO  # AGREGAR AJUSTAR TEXTO
 
                     # QUITAR LÍNEAS DE CUADRÍCULA DE CADA HOJA
                     ws.sheet_view.showGridLines = False
@@ -1198,7 +2720,7 @@ class App:
                                 column_name = columnas_final[col_idx - 1]  # -1 porque col_idx empieza en 1
                                 
                                 # Columnas que deben mantenerse como texto
-                                text_columns = ["SKX PO#", "STYLE/COLOR", "Case QTY", "US Size"]
+                                text_columns = ["SKX PO#", "STYLE/COLOR", "Case QTY", "US Size", "UPC Barcode"]
                                 
                                 if column_name not in text_columns and value:
                                     # Intentar convertir a número
@@ -1225,10 +2747,10 @@ class App:
                                     # Para columnas de texto, mantener como string
                                     cell.value = value
                                 
-                                cell.alignment = Alignment(horizontal="center", vertical="center")
+                                cell.alignment = ALINEACION_DATO
                                 
                                 # Mantener contenido sin negrita
-                                cell.font = Font(bold=False)
+                                cell.font = FUENTE_DATO
 
                     # Calcular last_data_row directamente del número de filas escritas
                     last_data_row = first_data_row + len(df_out) - 1
@@ -1248,6 +2770,11 @@ class App:
                 ]:
                     wb.remove(template_sheet)
 
+                if not df_revision.empty:
+                    escribir_hoja_revision(wb, HOJA_REVISION_COLORES, df_revision)
+                if not df_upcs_revision.empty:
+                    escribir_hoja_revision(wb, HOJA_REVISION_UPC, df_upcs_revision)
+
                 wb.save(final_filename)
 
                 # Cerrar ventana y preguntar si abrir
@@ -1291,4 +2818,14 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    # Necesario para ProcessPoolExecutor en el ejecutable de PyInstaller (Windows)
+    multiprocessing.freeze_support()
+    if "--purgar-cache" in sys.argv[1:]:
+        purgar_cache()
+        print(f"Caché vaciada: {CACHE_PDF_DB}")
+        sys.exit(0)
+    if "--purgar-indice" in sys.argv[1:]:
+        purgar_indice_upc()
+        print(f"Índice de UPC vaciado: {CACHE_PDF_DB}")
+        sys.exit(0)
     main()
@@ -0,0 +1,60 @@
+# Cada prueba corre contra las dos herramientas (mismas funciones, un módulo cada una)
+
+import datetime
+import importlib.util
+from pathlib import Path
+
+import openpyxl
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+HERRAMIENTAS = {
+    "upc": RAIZ / "upc_sticker" / "analizador_upc.py",
+    "cc": RAIZ / "case_content" / "extractor.py",
+}
+
+
+def cargar_herramienta(ruta: Path):
+    spec = importlib.util.spec_from_file_location(ruta.stem, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+@pytest.fixture(scope="session", params=sorted(HERRAMIENTAS))
+def herramienta(request):
+    return cargar_herramienta(HERRAMIENTAS[request.param])
+
+
+# Lector del Excel de datos de cada herramienta
+LECTORES_EXCEL = {"analizador_upc": "leer_excel_flexible", "extractor": "_read_excel_flexible"}
+
+
+def leer_excel(herramienta, ruta) -> "pd.DataFrame":
+    return getattr(herramienta, LECTORES_EXCEL[herramienta.__name__])(str(ruta))
+
+
+@pytest.fixture
+def excel_pedido(tmp_path) -> Path:
+    """Hoja de pedido chica como las reales: título, encabezado en la fila 3,
+    tallas casi todas vacías, columnas que no se usan y filas vacías al final."""
+    ruta = tmp_path / "pedido.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "PEDIDO"
+    ws.append(["REPORTE DE PEDIDOS"])
+    ws.append([])
+    ws.append(["STYLE", "OP", "PROTO", "DESTINO", "PO#", "DESCRIPCION COLOR", "COLOR", "LN",
+               "XS", "S", "M", "L", "XL", "OBS", "FECHA"])
+    for i in range(40):
+        tallas = [None] * 5
+        tallas[i % 5] = 12 * (i % 3)
+        if i % 4 == 0:
+            tallas[(i + 2) % 5] = "24"
+        ws.append([f"TP{100 + i // 8}", 50000 + i // 10, f"P{i // 10}", "USA" if i % 6 else "CANADA",
+                   4500000000 + i // 5, ["BLACK", "NAVY BLUE", "WHITE/GREY"][i % 3], ["001", "410", "100"][i % 3],
+                   i % 9, *tallas, f"nota {i}", datetime.datetime(2024, 1, 1 + i % 28)])
+    ws.append([])
+    ws.append([None, None])
+    wb.save(ruta)
+    return ruta
@@ -0,0 +1,43 @@
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+from conftest import LECTORES_EXCEL
+
+
+@pytest.fixture
+def cache(herramienta, tmp_path, monkeypatch):
+    monkeypatch.setattr(herramienta, "CACHE_PDF_DB", tmp_path / "cache.sqlite")
+    monkeypatch.setattr(herramienta, "CACHE_MAX_BYTES", 16 * 1024 * 1024)
+    return herramienta
+
+
+def test_excel_preparado_desde_la_cache(cache, excel_pedido, monkeypatch):
+    primero = cache.cargar_excel_preparado(str(excel_pedido))
+
+    def sin_lectura(ruta):
+        raise AssertionError("debió salir de la caché")
+
+    monkeypatch.setattr(cache, LECTORES_EXCEL[cache.__name__], sin_lectura)
+    segundo = cache.cargar_excel_preparado(str(excel_pedido))
+    pd.testing.assert_frame_equal(primero, segundo)
+
+
+def test_excel_cambiado_no_usa_la_cache(cache, excel_pedido):
+    primero = cache.cargar_excel_preparado(str(excel_pedido))
+    wb = openpyxl.load_workbook(excel_pedido)
+    wb.active["A4"] = "TP999"
+    wb.save(excel_pedido)
+    segundo = cache.cargar_excel_preparado(str(excel_pedido))
+    assert "TP999" in set(segundo["NOMBRE ESTILO"])
+    assert "TP999" not in set(primero["NOMBRE ESTILO"])
+
+
+def test_codificar_excel_ida_y_vuelta(herramienta):
+    df = pd.DataFrame({"A": ["x", np.nan, "x", "y"], "B": ["1", "2", "3", "4"]}, dtype=object)
+    datos = herramienta._codificar_excel(df)
+    pd.testing.assert_frame_equal(herramienta._decodificar_excel(datos), df)
+    # Lo que no se puede reconstruir igual no se guarda
+    assert herramienta._codificar_excel(df.assign(C=[1, 2, 3, 4])) is None
+    assert herramienta._codificar_excel(df.set_index("B")) is None
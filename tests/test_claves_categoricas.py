@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+
+def test_claves_categoricas_compartidas(herramienta):
+    df_excel = pd.DataFrame({
+        "NOMBRE ESTILO": ["tp1 ", "TP2"],
+        "NOMBRE COLOR": ["Navy", np.nan],
+        "COLOR": ["410", "001"],
+        "SIZE": ["xl", "S"],
+    })
+    df_pdfs = pd.DataFrame({
+        "STYLE": ["TP1", "TP3"],
+        "COLOR NAME": ["NAVY", "BLACK"],
+        "COLOR CODE": ["410", "002"],
+        "SIZE": ["XL", "M"],
+    })
+    herramienta.claves_categoricas(df_excel, df_pdfs)
+
+    # Mismas categorías (ordenadas como texto) a ambos lados de cada clave
+    for izq, der in (("NOMBRE ESTILO", "STYLE"), ("NOMBRE COLOR", "COLOR NAME"), ("COLOR", "COLOR CODE"), ("SIZE", "SIZE")):
+        assert df_excel[izq].dtype == df_pdfs[der].dtype
+        categorias = df_excel[izq].cat.categories.tolist()
+        assert categorias == sorted(categorias)
+    assert df_excel["NOMBRE ESTILO"].tolist() == ["TP1", "TP2"]
+    assert df_excel["NOMBRE COLOR"].cat.codes.tolist()[1] == -1  # NaN sigue siendo NaN
+    assert df_excel["NOMBRE COLOR"].cat.codes[0] == df_pdfs["COLOR NAME"].cat.codes[0]
+    assert df_excel["SIZE"].cat.codes[0] == df_pdfs["SIZE"].cat.codes[0]
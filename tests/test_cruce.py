@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+
+COLUMNAS_EXCEL = ["NOMBRE ESTILO", "DESTINO", "PO#", "NOMBRE COLOR", "COLOR", "SIZE"]
+CLAVES = ["NOMBRE ESTILO", "NOMBRE COLOR", "COLOR", "DESTINO", "PO#", "UPC CODE", "SIZE"]
+
+
+def excel(filas: list[tuple]) -> pd.DataFrame:
+    return pd.DataFrame(filas, columns=COLUMNAS_EXCEL)
+
+
+def pdfs(herramienta, filas: list[tuple]) -> pd.DataFrame:
+    registros = herramienta.RegistrosPDF()
+    for fila in filas:
+        registros.agregar(*fila)
+    return registros.to_dataframe()
+
+
+@pytest.fixture
+def pedido(herramienta):
+    df_excel = excel([
+        ("TP1", "USA", "45001", "BLACK", "001", "S"),
+        ("TP1", "USA", "45001", "BLACK", "001", "M"),
+        ("TP1", "USA", "45001", "navy ", "410", "S"),  # por nombre (normalizado) y por código
+        ("TP1", "CANADA", "45002", "NAVY", "999", "S"),  # sólo por nombre
+        ("TP2", "USA", "45003", "HEATHER", "6A1", "L"),  # sólo por código
+        ("TP2", "USA", "45003", "OFF WHITE", "F2B", "L"),  # sin cruce exacto
+        ("TP3", "USA", "45004", "BLACK", "001", "S"),  # estilo que no está en los PDFs
+    ])
+    df_pdfs = pdfs(herramienta, [
+        ("TP1", "001", "BLACK", "S", "036000291452"),
+        ("TP1", "001", "BLACK", "M", "036000291469"),
+        ("TP1", "410", "NAVY", "S", "012345678905"),
+        ("TP1", "410", "NAVY", "S", "012345678905"),  # repetido en otro PDF
+        ("TP2", "6A1", "HEATHER GREY", "L", "4006381333931"),
+        ("TP2", "F2B", "OFF-WHITE", "XL", "4006381333948"),
+    ])
+    herramienta.claves_categoricas(df_excel, df_pdfs)
+    return df_excel, df_pdfs
+
+
+def cruce_anterior(df_excel: pd.DataFrame, df_pdfs: pd.DataFrame) -> set[tuple]:
+    """Los dos pd.merge + concat + drop_duplicates que reemplaza cruzar_excel_pdf."""
+    por_nombre = pd.merge(df_excel, df_pdfs, left_on=["NOMBRE ESTILO", "NOMBRE COLOR", "SIZE"],
+                          right_on=["STYLE", "COLOR NAME", "SIZE"])
+    por_codigo = pd.merge(df_excel, df_pdfs, left_on=["NOMBRE ESTILO", "COLOR", "SIZE"],
+                          right_on=["STYLE", "COLOR CODE", "SIZE"])
+    df = pd.concat([por_nombre, por_codigo], ignore_index=True).drop_duplicates(subset=CLAVES)
+    return set(df[CLAVES].astype(str).itertuples(index=False, name=None))
+
+
+def test_cruce_igual_al_doble_merge(herramienta, pedido):
+    df_excel, df_pdfs = pedido
+    df, revision = herramienta.cruzar_excel_pdf(df_excel, df_pdfs)
+    obtenidas = list(df[CLAVES].astype(str).itertuples(index=False, name=None))
+    assert len(obtenidas) == len(set(obtenidas))  # sin repetidos
+    assert set(obtenidas) == cruce_anterior(df_excel.astype(str), df_pdfs.astype(str))
+    assert revision.empty
+
+
+def test_cruce_regla_de_mas_prioridad(herramienta, pedido):
+    df_excel, df_pdfs = pedido
+    df, _ = herramienta.cruzar_excel_pdf(df_excel, df_pdfs)
+    regla = {(f[0], f[1], f[2]): f[3] for f in df[["NOMBRE ESTILO", "DESTINO", "COLOR", "REGLA CRUCE"]]
+             .astype(str).itertuples(index=False, name=None)}
+    assert regla[("TP1", "USA", "410")] == "NOMBRE COLOR"
+    assert regla[("TP1", "CANADA", "999")] == "NOMBRE COLOR"
+    assert regla[("TP2", "USA", "6A1")] == "CODIGO COLOR"
+    assert herramienta.resumen_cruce(df) == "4 por nombre color, 1 por codigo color"
+
+
+@pytest.fixture
+def colores_parecidos(herramienta):
+    df_excel = excel([
+        ("TP5", "USA", "45005", "NAVY BLU", "999", "S"),  # casi igual a NAVY BLUE
+        ("TP5", "USA", "45005", "NAVY BLU", "999", "M"),
+        ("TP5", "USA", "45005", "GREY", "998", "S"),  # parecido a GREEN, pero no tanto
+        ("TP6", "USA", "45006", "NAVY BLU", "999", "S"),  # estilo que no está en los PDFs
+    ])
+    df_pdfs = pdfs(herramienta, [
+        ("TP5", "410", "NAVY BLUE", "S", "036000291452"),
+        ("TP5", "410", "NAVY BLUE", "M", "036000291469"),
+        ("TP5", "300", "GREEN", "S", "012345678905"),
+    ])
+    herramienta.claves_categoricas(df_excel, df_pdfs)
+    return df_excel, df_pdfs
+
+
+def test_cruce_difuso_apagado(herramienta, colores_parecidos):
+    df, revision = herramienta.cruzar_excel_pdf(*colores_parecidos)
+    assert df.empty
+    assert revision.empty
+
+
+def test_cruce_difuso_aplica_y_manda_a_revision(herramienta, colores_parecidos):
+    df, revision = herramienta.cruzar_excel_pdf(*colores_parecidos, difuso=True)
+    assert df["REGLA CRUCE"].astype(str).unique().tolist() == [herramienta.REGLA_COLOR_APROX]
+    assert df[["SIZE", "UPC CODE"]].astype(str).values.tolist() == [["S", "036000291452"], ["M", "036000291469"]]
+    estados = {(f[0], f[1]): f[2] for f in revision[["NOMBRE COLOR (EXCEL)", "COLOR NAME (PDF)", "ESTADO"]]
+               .astype(str).itertuples(index=False, name=None)}
+    assert estados == {("NAVY BLU", "NAVY BLUE"): "APLICADO", ("GREY", "GREEN"): "REVISAR"}
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+
+def test_despivotar_tallas_igual_al_melt_filtrado(herramienta):
+    # Celdas como las deja el lector del Excel: texto o NaN
+    rng = np.random.default_rng(3)
+    n = 60
+    df = pd.DataFrame({
+        "NOMBRE ESTILO": [f"TP{i // 7}" for i in range(n)],
+        "PO#": [str(4500 + i // 3) for i in range(n)],
+    })
+    tallas = ["S", "M", "L", "XL"]
+    for t in tallas:
+        df[t] = rng.choice(np.array([None, np.nan, "0", "12", "24", " ", "3.5", "-2", "X"], dtype=object), n)
+    id_vars = ["NOMBRE ESTILO", "PO#"]
+
+    completo = df.melt(id_vars=id_vars, value_vars=tallas, var_name="SIZE_RAW", value_name="QTY")
+    esperado = completo[herramienta.hay_cantidad(completo["QTY"])].reset_index(drop=True)
+    obtenido = herramienta.despivotar_tallas(df, id_vars, tallas, var_name="SIZE_RAW", value_name="QTY")
+    assert 0 < len(obtenido) < len(completo)
+    pd.testing.assert_frame_equal(obtenido, esperado)
+
+
+def test_despivotar_tallas_sin_cantidades(herramienta):
+    df = pd.DataFrame({"NOMBRE ESTILO": ["TP1", "TP2"], "S": [None, ""], "M": ["0", np.nan]}, dtype=object)
+    obtenido = herramienta.despivotar_tallas(df, ["NOMBRE ESTILO"], ["S", "M"], var_name="SIZE_RAW", value_name="QTY")
+    assert obtenido.empty
+    assert list(obtenido.columns) == ["NOMBRE ESTILO", "SIZE_RAW", "QTY"]
@@ -0,0 +1,20 @@
+import pandas as pd
+
+from conftest import leer_excel
+
+
+def test_streaming_igual_a_hoja_completa(herramienta, excel_pedido, monkeypatch):
+    monkeypatch.setattr(herramienta, "EXCEL_STREAMING", False)
+    completo = herramienta.preparar_excel(leer_excel(herramienta, excel_pedido))
+    monkeypatch.setattr(herramienta, "EXCEL_STREAMING", True)
+    util = herramienta.preparar_excel(leer_excel(herramienta, excel_pedido))
+    assert len(completo) > 0
+    pd.testing.assert_frame_equal(completo, util)
+
+
+def test_streaming_lee_solo_columnas_utiles(herramienta, excel_pedido, monkeypatch):
+    monkeypatch.setattr(herramienta, "EXCEL_STREAMING", True)
+    df = leer_excel(herramienta, excel_pedido)
+    assert len(df) == 40
+    assert "OBS" not in df.columns and "FECHA" not in df.columns
+    assert {"STYLE", "PO#", "XS", "XL"} <= set(df.columns)
@@ -0,0 +1,37 @@
+from concurrent.futures.process import BrokenProcessPool
+
+
+def test_un_pdf_sin_pool_sigue_en_secuencial(herramienta, monkeypatch):
+    registros = herramienta.RegistrosPDF()
+    registros.agregar("TP1", "001", "BLACK", "S", "036000291452")
+
+    def sin_procesos(*args, **kwargs):
+        raise BrokenProcessPool("sin procesos")
+
+    monkeypatch.setattr(herramienta, "extract_data_from_pdf_por_paginas", sin_procesos)
+    monkeypatch.setattr(herramienta, "extract_data_from_pdf", lambda pdf, estilos=None: registros)
+    assert herramienta._extraer_sin_cache(["a.pdf"], 4) == [(registros, "")]
+
+
+def test_un_pdf_con_error_se_reporta(herramienta, monkeypatch):
+    def falla(*args, **kwargs):
+        raise ValueError("PDF dañado")
+
+    monkeypatch.setattr(herramienta, "extract_data_from_pdf_por_paginas", falla)
+    [(registros, error)] = herramienta._extraer_sin_cache(["a.pdf"], 4)
+    assert len(registros) == 0
+    assert error == "ValueError: PDF dañado"
+
+
+def test_ensamblar_matricial_entre_paginas(herramienta):
+    # El estilo y sus tallas de una página siguen vigentes en la siguiente
+    paginas = [
+        [("S", "TP1", ["s", "m"]), ("C", "001", "BLACK", ["036000291452", "036000291469"])],
+        [("C", "410", "NAVY", ["012345678905"])],
+    ]
+    df = herramienta.ensamblar_matricial(paginas).to_dataframe()
+    assert df[["STYLE", "COLOR CODE", "SIZE", "UPC CODE"]].values.tolist() == [
+        ["TP1", "001", "S", "036000291452"],
+        ["TP1", "001", "M", "036000291469"],
+        ["TP1", "410", "S", "012345678905"],
+    ]
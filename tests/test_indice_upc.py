@@ -0,0 +1,40 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def indice(herramienta, tmp_path, monkeypatch):
+    monkeypatch.setattr(herramienta, "CACHE_PDF_DB", tmp_path / "cache.sqlite")
+    monkeypatch.setattr(herramienta, "INDICE_UPC", True)
+    return herramienta
+
+
+def registros(herramienta, upc: str) -> pd.DataFrame:
+    return pd.DataFrame([["TP1", "NVY", "NAVY", "S", upc, "TP1 NVY"]], columns=herramienta.COLUMNAS_REGISTRO)
+
+
+def test_indice_upc_reasignado_reemplaza_al_anterior(indice):
+    indice.indice_upc_guardar(registros(indice, "036000291452"))
+    indice.indice_upc_guardar(registros(indice, "012345678905"))
+    df = indice.indice_upc_registros(["TP1"]).to_dataframe()
+    assert df.values.tolist() == [["TP1", "NVY", "NAVY", "S", "012345678905", "TP1 NVY"]]
+
+
+def test_indice_upc_migra_la_clave_anterior(indice):
+    with sqlite3.connect(indice.CACHE_PDF_DB) as conn:
+        conn.execute(
+            "CREATE TABLE indice_upc ("
+            " style TEXT NOT NULL, color_code TEXT NOT NULL, color_name TEXT NOT NULL,"
+            " size TEXT NOT NULL, upc TEXT NOT NULL, style_color TEXT NOT NULL, visto REAL NOT NULL,"
+            " PRIMARY KEY (upc, style, color_code, color_name, size)) WITHOUT ROWID"
+        )
+        conn.executemany("INSERT INTO indice_upc VALUES (?, ?, ?, ?, ?, ?, ?)", [
+            ("TP1", "NVY", "NAVY", "S", "012345678905", "TP1 NVY", 2.0),
+            ("TP1", "NVY", "NAVY", "S", "036000291452", "TP1 NVY", 1.0),
+            ("TP1", "NVY", "NAVY", "M", "036000291469", "TP1 NVY", 1.0),
+        ])
+    conn.close()
+    df = indice.indice_upc_registros(["TP1", "TP2"]).to_dataframe()
+    assert df[["SIZE", "UPC CODE"]].values.tolist() == [["M", "036000291469"], ["S", "012345678905"]]
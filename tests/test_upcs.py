@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.mark.parametrize("upc, formato, esperado, estado", [
+    ("036000291452", "UPC-A", "036000291452", "OK"),
+    ("4006381333931", "EAN-13", "4006381333931", "OK"),
+    ("0-36000-29145-2", "UPC-A", "036000291452", "OK"),
+    ("036000291453", "UPC-A", "036000291453", "DIGITO VERIFICADOR"),
+    ("36000291452", "UPC-A", "036000291452", "OK"),  # cero inicial perdido
+    ("036000291452", "EAN-13", "0036000291452", "OK"),  # UPC-A como EAN-13
+    # Sobrantes de ceros a la izquierda: se quita sólo el exceso
+    ("0036000291452", "UPC-A", "036000291452", "OK"),
+    ("0001234567895", "UPC-A", "001234567895", "OK"),
+    ("00036000291452", "UPC-A", "036000291452", "OK"),
+    ("00036000291452", "EAN-13", "0036000291452", "OK"),
+    ("1036000291452", "UPC-A", "1036000291452", "LONGITUD"),
+    ("10036000291452", "EAN-13", "10036000291452", "LONGITUD"),
+    ("123", "UPC-A", "123", "LONGITUD"),
+    ("", "UPC-A", "", "VACIO"),
+    (np.nan, "UPC-A", "", "VACIO"),
+])
+def test_normalizar_upcs(herramienta, upc, formato, esperado, estado):
+    valores, estados = herramienta.normalizar_upcs(pd.Series([upc], name="UPC CODE"), formato)
+    assert valores.tolist() == [esperado]
+    assert estados.tolist() == [estado]
+
+
+def test_normalizar_upcs_digitos_no_ascii(herramienta):
+    # "٣" es dígito (isdecimal) pero no ASCII: se quita como cualquier otro carácter
+    upcs = pd.Series(["036000291452", "٣٦٠", "3600029145 2"], index=[5, 7, 9])
+    valores, estados = herramienta.normalizar_upcs(upcs)
+    assert valores.tolist() == ["036000291452", "", "036000291452"]
+    assert estados.tolist() == ["OK", "VACIO", "OK"]
+    assert valores.index.tolist() == [5, 7, 9]
+
+
+def test_upcs_a_revisar(herramienta):
+    df = pd.DataFrame({
+        "NOMBRE ESTILO": ["B", "A", "A", "A"],
+        "NOMBRE COLOR": ["NEGRO"] * 4,
+        "SIZE": ["S", "M", "M", "L"],
+        "UPC CODE": ["036000291453", "123", "123", "036000291452"],
+    })
+    df["UPC CODE"], df["UPC ESTADO"] = herramienta.normalizar_upcs(df["UPC CODE"])
+    revision = herramienta.upcs_a_revisar(df)
+    assert revision["UPC CODE"].tolist() == ["123", "036000291453"]
+    assert revision["UPC ESTADO"].tolist() == ["LONGITUD", "DIGITO VERIFICADOR"]